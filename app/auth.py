@@ -1,12 +1,19 @@
 from datetime import datetime, timezone, timedelta
 from typing import Optional
+import asyncio
+import hashlib
+import hmac
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from jose import JWTError, jwt
 import bcrypt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.config import settings
 from app.database import get_database
-from app.schemas import TokenData
+from app.utils.cache import TTLCache, token_cache, user_cache
+from app.utils.interaction_helper import ensure_embedded_interactions, USER_WITHOUT_INTERACTIONS_PROJECTION
 from bson import ObjectId
 
 security = HTTPBearer()
@@ -24,6 +31,43 @@ def get_password_hash(password: str) -> str:
     return hashed.decode('utf-8')
 
 
+# bcrypt releases the GIL, so hashing on a thread pool lets logins use every core
+# without blocking the event loop
+_password_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="bcrypt")
+
+
+# Recent successful verifications, keyed by a keyed hash of (stored hash, password) so repeat
+# logins within the TTL skip bcrypt. Failures are never cached, so guessing still costs bcrypt.
+_verified_passwords = TTLCache(maxsize=5000, ttl=60)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the bcrypt thread pool"""
+    cache_key = hmac.new(
+        settings.SECRET_KEY.encode('utf-8'),
+        hashed_password.encode('utf-8') + b"|" + plain_password.encode('utf-8'),
+        hashlib.sha256
+    ).digest()
+    if _verified_passwords.get(cache_key):
+        return True
+    
+    loop = asyncio.get_running_loop()
+    verified = await loop.run_in_executor(_password_pool, verify_password, plain_password, hashed_password)
+    if verified:
+        _verified_passwords.set(cache_key, True)
+    return verified
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the bcrypt thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_pool, get_password_hash, password)
+
+
+# Verified against when a login names an unknown user, so both failure paths cost one bcrypt check
+DUMMY_PASSWORD_HASH = get_password_hash("dummy-password-for-timing")
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if expires_delta:
@@ -35,6 +79,37 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+async def resolve_token_user(token: str) -> Optional[dict]:
+    """
+    Resolve an access token to its user document, using the auth caches when possible.
+    Returns None if the token has no subject or the user doesn't exist; raises JWTError if invalid.
+    """
+    token_key = hashlib.sha256(token.encode('utf-8')).digest()
+    cached_token = token_cache.get(token_key)
+    if cached_token and cached_token[1] > time.time():
+        user_id = cached_token[0]
+    else:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        user_id = payload.get("sub")
+        if user_id is None:
+            return None
+        token_cache.set(token_key, (user_id, payload["exp"]))
+    
+    user = user_cache.get(user_id)
+    if user is None:
+        db = get_database()
+        # The interaction arrays grow with the user's history, so they aren't loaded here;
+        # handlers fetch the state for the videos they return (load_user_interactions)
+        user = await db.users.find_one({"_id": ObjectId(user_id)}, USER_WITHOUT_INTERACTIONS_PROJECTION)
+        if user is None:
+            return None
+        
+        user = await ensure_embedded_interactions(db, user)
+        user_cache.set(user_id, user)
+    
+    return user
+
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -43,17 +118,10 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     )
     
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
-        token_data = TokenData(user_id=user_id)
+        user = await resolve_token_user(credentials.credentials)
     except JWTError:
         raise credentials_exception
     
-    db = get_database()
-    user = await db.users.find_one({"_id": ObjectId(token_data.user_id)})
     if user is None:
         raise credentials_exception
     
@@ -69,18 +137,10 @@ async def get_current_user_optional(credentials: Optional[HTTPAuthorizationCrede
         return None
     
     try:
-        token = credentials.credentials
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            return None
-        
-        db = get_database()
-        user = await db.users.find_one({"_id": ObjectId(user_id)})
+        user = await resolve_token_user(credentials.credentials)
         if user and user.get("is_active", True):
             return user
     except JWTError:
         pass
     
     return None
-
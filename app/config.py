@@ -1,5 +1,6 @@
+from functools import cached_property
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import FrozenSet
 
 
 class Settings(BaseSettings):
@@ -34,18 +35,29 @@ class Settings(BaseSettings):
     VIDEO_BITRATE_480P: str = "900k"
     VIDEO_BITRATE_360P: str = "500k"
     USE_TWO_PASS_ENCODING: bool = False  # Disable two-pass by default to save resources
+    VIDEO_HW_ENCODER: str = "none"  # none, auto, nvenc, vaapi - hardware H.264 encoder for single-pass HLS
+    VAAPI_DEVICE: str = "/dev/dri/renderD128"
+    HLS_SINGLE_FILE: bool = False  # Single-pass only: one fMP4 file per rendition (byte-range playlist) instead of .ts segments
+    HLS_TMP_DIR: str = "/dev/shm/hls"  # Scratch space for HLS output (tmpfs keeps it in RAM); falls back to the system temp dir
     
     # Resource Limiting Settings
-    FFMPEG_THREADS: int = 2  # Limit FFmpeg to use fewer threads to avoid overloading the server
+    FFMPEG_THREADS: int = 0  # Threads per processing job, split across its renditions; 0 = an equal share of the cores per MAX_CONCURRENT_UPLOADS job
     MAX_CONCURRENT_UPLOADS: int = 1  # Maximum number of concurrent video processing tasks
+    ORPHANED_VIDEO_TIMEOUT_MINUTES: int = 120  # Unfinished videos of another host untouched this long are marked failed
     MAX_CONCURRENT_DELETIONS: int = 2  # Maximum number of concurrent deletion tasks
     MAX_CONCURRENT_S3_OPS: int = 10  # Maximum number of concurrent S3 operations
+    VIEW_COUNT_FLUSH_SECONDS: int = 5  # How often buffered view counts are written to MongoDB
     
-    @property
-    def allowed_video_types_list(self) -> List[str]:
-        return [t.strip() for t in self.ALLOWED_VIDEO_TYPES.split(",")]
+    # Rate limit counter storage; point at Redis (e.g. redis://localhost:6379/1, needs the redis package)
+    # so counters are shared across gunicorn workers instead of kept per process
+    RATE_LIMIT_STORAGE_URI: str = "memory://"
     
-    @property
+    # Settings don't change after startup, so these are derived once instead of on every upload
+    @cached_property
+    def allowed_video_types(self) -> FrozenSet[str]:
+        return frozenset(t.strip() for t in self.ALLOWED_VIDEO_TYPES.split(","))
+    
+    @cached_property
     def max_video_size_bytes(self) -> int:
         return self.MAX_VIDEO_SIZE_MB * 1024 * 1024
     
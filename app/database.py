@@ -17,6 +17,8 @@ async def connect_to_mongo():
     await db.videos.create_index([("likes", -1)])
     await db.videos.create_index([("views", -1)])
     await db.videos.create_index("uploader_id")
+    await db.videos.create_index("processing_status")  # For recovering unfinished videos at startup
+    await db.videos.create_index([("uploader_id", 1), ("is_active", 1), ("created_at", -1)])  # For listing a user's own videos
     
     # Tag-related indexes
     await db.videos.create_index("tags")  # For tag-based queries
@@ -26,6 +28,20 @@ async def connect_to_mongo():
     # Text search indexes
     await db.videos.create_index([("title", "text"), ("description", "text")])  # For search functionality
     
+    # Interaction indexes
+    # At most one like/dislike/save per user and video. Databases with rows duplicated by the old
+    # read-then-write toggles need scripts/migrate_unique_indexes.py run once first
+    await db.interactions.create_index([("user_id", 1), ("video_id", 1), ("interaction_type", 1)], unique=True)
+    await db.interactions.create_index([("user_id", 1), ("interaction_type", 1), ("created_at", -1)])  # For saved videos feed
+    await db.interactions.create_index("video_id")  # For cleanup when a video is deleted
+    
+    # View history indexes
+    # One history row per user and video, upserted by track_video_view. Databases with rows
+    # duplicated by the old find-then-insert need scripts/migrate_unique_indexes.py run once first
+    await db.user_view_history.create_index([("user_id", 1), ("video_id", 1)], unique=True)
+    await db.user_view_history.create_index([("user_id", 1), ("expires_at", 1)])  # For excluding viewed videos from feeds
+    await db.user_view_history.create_index("expires_at", expireAfterSeconds=0)  # Let MongoDB purge expired history
+    
     # Comment indexes
     await db.comments.create_index([("video_id", 1), ("created_at", -1)])
     await db.comments.create_index([("parent_comment_id", 1), ("created_at", -1)])
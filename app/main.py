@@ -1,5 +1,5 @@
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from slowapi.errors import RateLimitExceeded
@@ -17,21 +17,28 @@ async def lifespan(app: FastAPI):
     # Start video processing queue worker
     from app.utils.video_queue import video_queue
     video_queue.start_worker()
+    await video_queue.requeue_interrupted()
     
     # Start file deletion queue worker
     from app.utils.deletion_queue import deletion_queue
     deletion_queue.start_worker()
     
+    # Start batched view count flusher
+    from app.utils.view_counter import view_counter
+    view_counter.start_worker()
+    
     yield
     
     # Shutdown
     await video_queue.stop_worker()
     await deletion_queue.stop_worker()
+    await view_counter.stop_worker()
     await close_mongo_connection()
 
 
 app = FastAPI(
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url=None,
     redoc_url=None
 )
@@ -64,6 +71,30 @@ app.add_middleware(
 )
 
 
+# Reject oversized video uploads from the declared Content-Length,
+# before the multipart body is read and spooled to disk
+UPLOAD_FORM_OVERHEAD_BYTES = 1024 * 1024  # Room for the other form fields and multipart boundaries
+
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    if request.method == "POST" and request.url.path == "/videos/upload":
+        content_length = request.headers.get("content-length")
+        if (
+            content_length
+            and content_length.isdigit()
+            and int(content_length) > settings.max_video_size_bytes + UPLOAD_FORM_OVERHEAD_BYTES
+        ):
+            return JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={
+                    "status": "error",
+                    "message": f"Video size exceeds maximum limit of {settings.MAX_VIDEO_SIZE_MB}MB",
+                    "data": None
+                }
+            )
+    return await call_next(request)
+
+
 # Global exception handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
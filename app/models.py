@@ -57,6 +57,9 @@ class UserInDB(BaseModel):
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     is_active: bool = True
     show_nsfw: NSFWPreference = NSFWPreference.ASK  # User preference for NSFW content (default: ask before showing)
+    liked_videos: List[str] = Field(default_factory=list)  # Embedded interaction state (mirrors interactions collection)
+    disliked_videos: List[str] = Field(default_factory=list)
+    saved_videos: List[str] = Field(default_factory=list)
 
 
 class VideoInDB(BaseModel):
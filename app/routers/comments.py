@@ -1,10 +1,14 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from typing import Optional
 from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ReturnDocument
 from datetime import datetime, timezone
-from app.schemas import CommentCreate, CommentResponse, CommentWithReplies, APIResponse, ReportCreate
+from app.schemas import CommentCreate, APIResponse, ReportCreate
 from app.auth import get_current_user, get_current_user_optional
 from app.database import get_database
+from app.utils.video_helper import valid_video_oid
 from app.utils.datetime_helper import format_datetime_response
 from app.utils.rate_limit import (
     limiter,
@@ -19,6 +23,17 @@ from app.utils.rate_limit import (
 router = APIRouter(prefix="/comments", tags=["comments"])
 
 
+async def valid_comment_oid(comment_id: str) -> ObjectId:
+    """FastAPI dependency that parses the comment_id path parameter once, or rejects it with 400"""
+    try:
+        return ObjectId(comment_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid comment ID"
+        )
+
+
 @router.post("/videos/{video_id}", response_model=APIResponse, status_code=status.HTTP_201_CREATED)
 @limiter.limit(RATE_LIMIT_COMMENT_CREATE)
 async def create_comment(
@@ -26,7 +41,8 @@ async def create_comment(
     response: Response,
     video_id: str,
     comment_data: CommentCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    video_oid: ObjectId = Depends(valid_video_oid)
 ):
     """
     Create a comment on a video
@@ -34,15 +50,8 @@ async def create_comment(
     """
     db = get_database()
     
-    # Validate video_id
-    if not ObjectId.is_valid(video_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid video ID"
-        )
-    
     # Check if video exists
-    video = await db.videos.find_one({"_id": ObjectId(video_id), "is_active": True})
+    video = await db.videos.find_one({"_id": video_oid, "is_active": True})
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -50,6 +59,7 @@ async def create_comment(
         )
     
     # Create comment
+    now = datetime.now(timezone.utc)
     comment_doc = {
         "video_id": video_id,
         "user_id": str(current_user["_id"]),
@@ -58,30 +68,31 @@ async def create_comment(
         "parent_comment_id": None,
         "likes": 0,
         "replies_count": 0,
-        "created_at": datetime.now(timezone.utc),
-        "updated_at": datetime.now(timezone.utc),
+        "created_at": now,
+        "updated_at": now,
         "is_active": True
     }
     
     result = await db.comments.insert_one(comment_doc)
     
-    comment_response = CommentResponse(
-        id=str(result.inserted_id),
-        video_id=comment_doc["video_id"],
-        user_id=comment_doc["user_id"],
-        username=comment_doc["username"],
-        text=comment_doc["text"],
-        parent_comment_id=None,
-        likes=0,
-        replies_count=0,
-        created_at=format_datetime_response(comment_doc["created_at"]),
-        user_liked=False
-    )
+    # Shaped like CommentResponse, built directly since every value was just written by us
+    comment_response = {
+        "id": str(result.inserted_id),
+        "video_id": comment_doc["video_id"],
+        "user_id": comment_doc["user_id"],
+        "username": comment_doc["username"],
+        "text": comment_doc["text"],
+        "parent_comment_id": None,
+        "likes": 0,
+        "replies_count": 0,
+        "created_at": format_datetime_response(comment_doc["created_at"]),
+        "user_liked": False
+    }
     
     return APIResponse(
         status="success",
         message="Comment created successfully",
-        data={"comment": comment_response.model_dump()}
+        data={"comment": comment_response}
     )
 
 
@@ -92,7 +103,8 @@ async def reply_to_comment(
     response: Response,
     comment_id: str,
     reply_data: CommentCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    comment_oid: ObjectId = Depends(valid_comment_oid)
 ):
     """
     Reply to a comment (only 1 level deep - no nested replies)
@@ -100,15 +112,8 @@ async def reply_to_comment(
     """
     db = get_database()
     
-    # Validate comment_id
-    if not ObjectId.is_valid(comment_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid comment ID"
-        )
-    
     # Get parent comment
-    parent_comment = await db.comments.find_one({"_id": ObjectId(comment_id), "is_active": True})
+    parent_comment = await db.comments.find_one({"_id": comment_oid, "is_active": True})
     if not parent_comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -123,6 +128,7 @@ async def reply_to_comment(
         )
     
     # Create reply
+    now = datetime.now(timezone.utc)
     reply_doc = {
         "video_id": parent_comment["video_id"],
         "user_id": str(current_user["_id"]),
@@ -131,8 +137,8 @@ async def reply_to_comment(
         "parent_comment_id": comment_id,
         "likes": 0,
         "replies_count": 0,  # Replies can't have replies
-        "created_at": datetime.now(timezone.utc),
-        "updated_at": datetime.now(timezone.utc),
+        "created_at": now,
+        "updated_at": now,
         "is_active": True
     }
     
@@ -140,27 +146,28 @@ async def reply_to_comment(
     
     # Increment parent comment's replies_count
     await db.comments.update_one(
-        {"_id": ObjectId(comment_id)},
+        {"_id": parent_comment["_id"]},
         {"$inc": {"replies_count": 1}}
     )
     
-    reply_response = CommentResponse(
-        id=str(result.inserted_id),
-        video_id=reply_doc["video_id"],
-        user_id=reply_doc["user_id"],
-        username=reply_doc["username"],
-        text=reply_doc["text"],
-        parent_comment_id=comment_id,
-        likes=0,
-        replies_count=0,
-        created_at=format_datetime_response(reply_doc["created_at"]),
-        user_liked=False
-    )
+    # Shaped like CommentResponse, built directly since every value was just written by us
+    reply_response = {
+        "id": str(result.inserted_id),
+        "video_id": reply_doc["video_id"],
+        "user_id": reply_doc["user_id"],
+        "username": reply_doc["username"],
+        "text": reply_doc["text"],
+        "parent_comment_id": comment_id,
+        "likes": 0,
+        "replies_count": 0,
+        "created_at": format_datetime_response(reply_doc["created_at"]),
+        "user_liked": False
+    }
     
     return APIResponse(
         status="success",
         message="Reply created successfully",
-        data={"comment": reply_response.model_dump()}
+        data={"comment": reply_response}
     )
 
 
@@ -172,7 +179,8 @@ async def get_video_comments(
     video_id: str,
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
-    current_user: Optional[dict] = Depends(get_current_user_optional)
+    current_user: Optional[dict] = Depends(get_current_user_optional),
+    video_oid: ObjectId = Depends(valid_video_oid)
 ):
     """
     Get all comments for a video with their replies
@@ -180,13 +188,6 @@ async def get_video_comments(
     """
     db = get_database()
     
-    # Validate video_id
-    if not ObjectId.is_valid(video_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid video ID"
-        )
-    
     skip = (page - 1) * page_size
     
     # Get top-level comments (no parent)
@@ -205,79 +206,81 @@ async def get_video_comments(
         "is_active": True
     })
     
+    # Get replies for every comment on the page in one query, oldest first and at most 100 per comment.
+    # The sort order walks the (parent_comment_id, created_at) index backwards
+    page_ids = [str(comment["_id"]) for comment in comments]
+    replies_by_parent = {}
+    if page_ids:
+        replies_cursor = db.comments.aggregate([
+            {"$match": {"parent_comment_id": {"$in": page_ids}, "is_active": True}},
+            {"$sort": {"parent_comment_id": -1, "created_at": 1}},
+            {"$group": {"_id": "$parent_comment_id", "replies": {"$push": "$$ROOT"}}},
+            {"$project": {"replies": {"$slice": ["$replies", 100]}}}  # Limit replies shown
+        ])
+        replies_by_parent = {group["_id"]: group["replies"] async for group in replies_cursor}
+    replies_per_comment = [replies_by_parent.get(comment_id, []) for comment_id in page_ids]
+    
+    # Load which of the page's comments and replies the current user liked in one query
+    liked_comment_ids = set()
+    if current_user:
+        page_comment_ids = list(page_ids)
+        page_comment_ids.extend(str(reply["_id"]) for replies in replies_per_comment for reply in replies)
+        likes_cursor = db.comment_likes.find(
+            {"user_id": str(current_user["_id"]), "comment_id": {"$in": page_comment_ids}},
+            {"_id": 0, "comment_id": 1}
+        )
+        liked_comment_ids = {like["comment_id"] async for like in likes_cursor}
+    
     # Format comments with replies
     comments_list = []
-    for comment in comments:
+    for comment, replies in zip(comments, replies_per_comment):
         comment_id = str(comment["_id"])
         
         # Check if current user liked this comment
-        user_liked = False
-        if current_user:
-            user_id = str(current_user["_id"])
-            like = await db.comment_likes.find_one({
-                "comment_id": comment_id,
-                "user_id": user_id
-            })
-            user_liked = like is not None
-        
-        # Get replies
-        replies_cursor = db.comments.find({
-            "parent_comment_id": comment_id,
-            "is_active": True
-        }).sort("created_at", 1).limit(100)  # Limit replies shown
-        
-        replies = await replies_cursor.to_list(length=100)
+        user_liked = comment_id in liked_comment_ids
         
         replies_list = []
         for reply in replies:
             reply_id = str(reply["_id"])
-            reply_user_liked = False
-            
-            if current_user:
-                reply_like = await db.comment_likes.find_one({
-                    "comment_id": reply_id,
-                    "user_id": user_id
-                })
-                reply_user_liked = reply_like is not None
+            reply_user_liked = reply_id in liked_comment_ids
             
-            reply_response = CommentResponse(
-                id=reply_id,
-                video_id=reply["video_id"],
-                user_id=reply["user_id"],
-                username=reply["username"],
-                text=reply["text"],
-                parent_comment_id=reply.get("parent_comment_id"),
-                likes=reply["likes"],
-                replies_count=0,
-                created_at=format_datetime_response(reply["created_at"]),
-                user_liked=reply_user_liked
-            )
-            replies_list.append(reply_response.model_dump())
+            replies_list.append({
+                "id": reply_id,
+                "video_id": reply["video_id"],
+                "user_id": reply["user_id"],
+                "username": reply["username"],
+                "text": reply["text"],
+                "parent_comment_id": reply.get("parent_comment_id"),
+                "likes": reply["likes"],
+                "replies_count": 0,
+                "created_at": format_datetime_response(reply["created_at"]),
+                "user_liked": reply_user_liked
+            })
         
-        comment_with_replies = CommentWithReplies(
-            id=comment_id,
-            video_id=comment["video_id"],
-            user_id=comment["user_id"],
-            username=comment["username"],
-            text=comment["text"],
-            likes=comment["likes"],
-            replies_count=comment["replies_count"],
-            created_at=format_datetime_response(comment["created_at"]),
-            user_liked=user_liked,
-            replies=replies_list
-        )
-        comments_list.append(comment_with_replies.model_dump())
+        comments_list.append({
+            "id": comment_id,
+            "video_id": comment["video_id"],
+            "user_id": comment["user_id"],
+            "username": comment["username"],
+            "text": comment["text"],
+            "likes": comment["likes"],
+            "replies_count": comment["replies_count"],
+            "created_at": format_datetime_response(comment["created_at"]),
+            "user_liked": user_liked,
+            "replies": replies_list
+        })
     
-    return APIResponse(
-        status="success",
-        message="Comments retrieved successfully",
-        data={
+    # Plain dicts shaped like CommentWithReplies, encoded by orjson without a Pydantic pass
+    return ORJSONResponse({
+        "status": "success",
+        "message": "Comments retrieved successfully",
+        "data": {
             "comments": comments_list,
             "total": total,
             "page": page,
             "page_size": page_size
         }
-    )
+    })
 
 
 @router.post("/{comment_id}/like", response_model=APIResponse)
@@ -286,7 +289,8 @@ async def like_comment(
     request: Request,
     response: Response,
     comment_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    comment_oid: ObjectId = Depends(valid_comment_oid)
 ):
     """
     Like or unlike a comment (toggle)
@@ -295,15 +299,8 @@ async def like_comment(
     db = get_database()
     user_id = str(current_user["_id"])
     
-    # Validate comment_id
-    if not ObjectId.is_valid(comment_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid comment ID"
-        )
-    
     # Check if comment exists
-    comment = await db.comments.find_one({"_id": ObjectId(comment_id), "is_active": True})
+    comment = await db.comments.find_one({"_id": comment_oid, "is_active": True})
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -319,13 +316,14 @@ async def like_comment(
     if existing_like:
         # Unlike
         await db.comment_likes.delete_one({"_id": existing_like["_id"]})
-        await db.comments.update_one(
-            {"_id": ObjectId(comment_id)},
-            {"$inc": {"likes": -1}}
+        # Increment and read back the new count in one round trip
+        updated_comment = await db.comments.find_one_and_update(
+            {"_id": comment["_id"]},
+            {"$inc": {"likes": -1}},
+            projection={"likes": 1},
+            return_document=ReturnDocument.AFTER
         )
         
-        updated_comment = await db.comments.find_one({"_id": ObjectId(comment_id)})
-        
         return APIResponse(
             status="success",
             message="Comment unliked",
@@ -341,13 +339,14 @@ async def like_comment(
             "user_id": user_id,
             "created_at": datetime.now(timezone.utc)
         })
-        await db.comments.update_one(
-            {"_id": ObjectId(comment_id)},
-            {"$inc": {"likes": 1}}
+        # Increment and read back the new count in one round trip
+        updated_comment = await db.comments.find_one_and_update(
+            {"_id": comment["_id"]},
+            {"$inc": {"likes": 1}},
+            projection={"likes": 1},
+            return_document=ReturnDocument.AFTER
         )
         
-        updated_comment = await db.comments.find_one({"_id": ObjectId(comment_id)})
-        
         return APIResponse(
             status="success",
             message="Comment liked",
@@ -364,7 +363,8 @@ async def delete_comment(
     request: Request,
     response: Response,
     comment_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    comment_oid: ObjectId = Depends(valid_comment_oid)
 ):
     """
     Delete a comment (only owner can delete)
@@ -372,15 +372,8 @@ async def delete_comment(
     """
     db = get_database()
     
-    # Validate comment_id
-    if not ObjectId.is_valid(comment_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid comment ID"
-        )
-    
     # Get comment
-    comment = await db.comments.find_one({"_id": ObjectId(comment_id), "is_active": True})
+    comment = await db.comments.find_one({"_id": comment_oid, "is_active": True})
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -409,7 +402,7 @@ async def delete_comment(
     
     # Mark comment as inactive (soft delete)
     await db.comments.update_one(
-        {"_id": ObjectId(comment_id)},
+        {"_id": comment["_id"]},
         {"$set": {"is_active": False, "updated_at": datetime.now(timezone.utc)}}
     )
     
@@ -430,7 +423,8 @@ async def report_comment(
     response: Response,
     comment_id: str,
     report_data: ReportCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    comment_oid: ObjectId = Depends(valid_comment_oid)
 ):
     """
     Report a comment
@@ -439,15 +433,8 @@ async def report_comment(
     db = get_database()
     user_id = str(current_user["_id"])
     
-    # Validate comment_id
-    if not ObjectId.is_valid(comment_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid comment ID"
-        )
-    
     # Check if comment exists
-    comment = await db.comments.find_one({"_id": ObjectId(comment_id), "is_active": True})
+    comment = await db.comments.find_one({"_id": comment_oid, "is_active": True})
     if not comment:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,15 +1,18 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from typing import Optional, List
 from bson import ObjectId
 from datetime import datetime, timezone, timedelta
-from app.schemas import VideoResponse, VideoList, APIResponse
+from app.schemas import VideoList, APIResponse
 from app.auth import get_current_user, get_current_user_optional
 from app.database import get_database
 from app.models import NSFWPreference
-from app.utils.datetime_helper import format_datetime_response
+from app.utils.interaction_helper import get_user_interaction, load_user_interactions
+from app.utils.video_helper import video_doc_to_response_dict
 from app.utils.rate_limit import limiter, RATE_LIMIT_READ
 
 import random
+import re
 
 router = APIRouter(prefix="/feeds", tags=["feeds"])
 
@@ -33,8 +36,11 @@ async def get_trending_videos(
     # Calculate skip
     skip = (page - 1) * page_size
     
+    # Single timestamp for the recency window and the view-history check
+    now = datetime.now(timezone.utc)
+    
     # Get videos from last 30 days with engagement score
-    thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
+    thirty_days_ago = now - timedelta(days=30)
     
     # Fetch more videos than needed for randomization
     fetch_size = min(page_size * 5, 150)  # Fetch 5x more videos but cap at 150
@@ -43,7 +49,6 @@ async def get_trending_videos(
     excluded_video_ids = []
     if current_user:
         user_id = str(current_user["_id"])
-        now = datetime.now(timezone.utc)
         
         # Get all videos the user has viewed within the history window
         viewed_videos_cursor = db.user_view_history.find({
@@ -137,7 +142,7 @@ async def get_trending_videos(
         additional_needed = page_size - len(videos)
         
         # Get IDs of videos we already have to exclude them
-        existing_ids = [ObjectId(str(video["_id"])) for video in videos]
+        existing_ids = [video["_id"] for video in videos]
         
         if existing_ids:
             fallback_match["_id"] = {"$nin": existing_ids}
@@ -177,69 +182,26 @@ async def get_trending_videos(
         videos.extend(additional_videos)
     
     # Format videos with user interactions if authenticated
+    await load_user_interactions(db, request, current_user, [str(video["_id"]) for video in videos])
     video_list = []
     for video in videos:
         user_interaction = None
         if current_user:
-            user_id = str(current_user["_id"])
             video_id = str(video["_id"])
-            
-            like = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "interaction_type": "like"
-            })
-            dislike = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "interaction_type": "dislike"
-            })
-            save = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "interaction_type": "save"
-            })
-            
-            user_interaction = {
-                "liked": like is not None,
-                "disliked": dislike is not None,
-                "saved": save is not None
-            }
+            user_interaction = get_user_interaction(request, video_id)
         
-        video_response = VideoResponse(
-            id=str(video["_id"]),
-            uploader_id=video["uploader_id"],
-            uploader_username=video["uploader_username"],
-            uploader_profile_image_url=video.get("uploader_profile_image_url"),
-            title=video["title"],
-            description=video.get("description"),
-            tags=video.get("tags", []),
-            playlist_url=video["playlist_url"],
-            thumbnail_url=video.get("thumbnail_url"),
-            duration=video.get("duration"),
-            views=video["views"],
-            likes=video["likes"],
-            dislikes=video["dislikes"],
-            saved_count=video["saved_count"],
-            processing_status=video.get("processing_status", "completed"),
-            created_at=format_datetime_response(video["created_at"]),
-            user_interaction=user_interaction,
-            is_nsfw=video.get("is_nsfw", False),
-            last_part_id=video.get("last_part_id"),
-            next_part_id=video.get("next_part_id")
-        )
-        video_list.append(video_response.model_dump())
+        video_list.append(video_doc_to_response_dict(video, user_interaction=user_interaction))
     
-    return APIResponse(
-        status="success",
-        message="Trending videos retrieved successfully",
-        data={
+    return ORJSONResponse({
+        "status": "success",
+        "message": "Trending videos retrieved successfully",
+        "data": {
             "videos": video_list,
             "total": total,
             "page": page,
             "page_size": page_size
         }
-    )
+    })
 
 
 @router.get("/recent", response_model=APIResponse)
@@ -353,7 +315,7 @@ async def get_recent_videos(
         additional_needed = page_size - len(videos)
         
         # Get IDs of videos we already have to exclude them
-        existing_ids = [ObjectId(str(video["_id"])) for video in videos]
+        existing_ids = [video["_id"] for video in videos]
         
         if existing_ids:
             fallback_match["_id"] = {"$nin": existing_ids}
@@ -381,69 +343,26 @@ async def get_recent_videos(
         videos.extend(additional_videos)
     
     # Format videos with user interactions if authenticated
+    await load_user_interactions(db, request, current_user, [str(video["_id"]) for video in videos])
     video_list = []
     for video in videos:
         user_interaction = None
         if current_user:
-            user_id = str(current_user["_id"])
             video_id = str(video["_id"])
-            
-            like = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "interaction_type": "like"
-            })
-            dislike = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "interaction_type": "dislike"
-            })
-            save = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "interaction_type": "save"
-            })
-            
-            user_interaction = {
-                "liked": like is not None,
-                "disliked": dislike is not None,
-                "saved": save is not None
-            }
+            user_interaction = get_user_interaction(request, video_id)
         
-        video_response = VideoResponse(
-            id=str(video["_id"]),
-            uploader_id=video["uploader_id"],
-            uploader_username=video["uploader_username"],
-            uploader_profile_image_url=video.get("uploader_profile_image_url"),
-            title=video["title"],
-            description=video.get("description"),
-            tags=video.get("tags", []),
-            playlist_url=video["playlist_url"],
-            thumbnail_url=video.get("thumbnail_url"),
-            duration=video.get("duration"),
-            views=video["views"],
-            likes=video["likes"],
-            dislikes=video["dislikes"],
-            saved_count=video["saved_count"],
-            processing_status=video.get("processing_status", "completed"),
-            created_at=format_datetime_response(video["created_at"]),
-            user_interaction=user_interaction,
-            is_nsfw=video.get("is_nsfw", False),
-            last_part_id=video.get("last_part_id"),
-            next_part_id=video.get("next_part_id")
-        )
-        video_list.append(video_response.model_dump())
+        video_list.append(video_doc_to_response_dict(video, user_interaction=user_interaction))
     
-    return APIResponse(
-        status="success",
-        message="Recent videos retrieved successfully",
-        data={
+    return ORJSONResponse({
+        "status": "success",
+        "message": "Recent videos retrieved successfully",
+        "data": {
             "videos": video_list,
             "total": total,
             "page": page,
             "page_size": page_size
         }
-    )
+    })
 
 
 @router.get("/saved", response_model=APIResponse)
@@ -490,6 +409,7 @@ async def get_saved_videos(
     video_map = {str(video["_id"]): video for video in videos}
     
     # Format videos in the order of saved_interactions
+    await load_user_interactions(db, request, current_user, list(video_map))
     video_list = []
     for interaction in saved_interactions:
         video_id = interaction["video_id"]
@@ -497,56 +417,21 @@ async def get_saved_videos(
             video = video_map[video_id]
             
             # Get user interactions
-            like = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "interaction_type": "like"
-            })
-            dislike = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "interaction_type": "dislike"
-            })
-            
-            user_interaction = {
-                "liked": like is not None,
-                "disliked": dislike is not None,
-                "saved": True  # Obviously true since we're in saved videos
-            }
+            user_interaction = get_user_interaction(request, video_id)
+            user_interaction["saved"] = True  # Obviously true since we're in saved videos
             
-            video_response = VideoResponse(
-                id=str(video["_id"]),
-                uploader_id=video["uploader_id"],
-                uploader_username=video["uploader_username"],
-                uploader_profile_image_url=video.get("uploader_profile_image_url"),
-                title=video["title"],
-                description=video.get("description"),
-                tags=video.get("tags", []),
-                playlist_url=video["playlist_url"],
-                thumbnail_url=video.get("thumbnail_url"),
-                duration=video.get("duration"),
-                views=video["views"],
-                likes=video["likes"],
-                dislikes=video["dislikes"],
-                saved_count=video["saved_count"],
-                created_at=format_datetime_response(video["created_at"]),
-                user_interaction=user_interaction,
-                is_nsfw=video.get("is_nsfw", False),
-                last_part_id=video.get("last_part_id"),
-                next_part_id=video.get("next_part_id")
-            )
-            video_list.append(video_response.model_dump())
-    
-    return APIResponse(
-        status="success",
-        message="Saved videos retrieved successfully",
-        data={
+            video_list.append(video_doc_to_response_dict(video, video_id, user_interaction))
+    
+    return ORJSONResponse({
+        "status": "success",
+        "message": "Saved videos retrieved successfully",
+        "data": {
             "videos": video_list,
             "total": total,
             "page": page,
             "page_size": page_size
         }
-    )
+    })
 
 
 @router.get("/discover", response_model=APIResponse)
@@ -564,8 +449,11 @@ async def discover_videos(
     """
     db = get_database()
     
+    # Single timestamp for the recency window and the view-history check
+    now = datetime.now(timezone.utc)
+    
     # Get videos from last 30 days
-    thirty_days_ago = datetime.now(timezone.utc) - timedelta(days=30)
+    thirty_days_ago = now - timedelta(days=30)
     
     # Determine how many trending vs new videos to include
     trending_count = max(page_size // 2, 5)  # At least 5 trending videos or half the page size
@@ -575,7 +463,6 @@ async def discover_videos(
     excluded_video_ids = []
     if current_user:
         user_id = str(current_user["_id"])
-        now = datetime.now(timezone.utc)
         
         # Get all videos the user has viewed within the history window
         viewed_videos_cursor = db.user_view_history.find({
@@ -673,7 +560,7 @@ async def discover_videos(
         needed_count = max(1, page_size - len(videos))  # Ensure needed_count is at least 1
         
         # Get IDs of videos we already have to exclude them from fallback query
-        existing_ids = [ObjectId(str(video["_id"])) for video in videos]
+        existing_ids = [video["_id"] for video in videos]
         
         fallback_match = {
             "is_active": True,
@@ -691,69 +578,26 @@ async def discover_videos(
         videos.extend(fallback_videos)
     
     # Format videos with user interactions if authenticated
+    await load_user_interactions(db, request, current_user, [str(video["_id"]) for video in videos])
     video_list = []
     for video in videos:
         user_interaction = None
         if current_user:
-            user_id = str(current_user["_id"])
             video_id = str(video["_id"])
-            
-            like = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "interaction_type": "like"
-            })
-            dislike = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "interaction_type": "dislike"
-            })
-            save = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "interaction_type": "save"
-            })
-            
-            user_interaction = {
-                "liked": like is not None,
-                "disliked": dislike is not None,
-                "saved": save is not None
-            }
+            user_interaction = get_user_interaction(request, video_id)
         
-        video_response = VideoResponse(
-            id=str(video["_id"]),
-            uploader_id=video["uploader_id"],
-            uploader_username=video["uploader_username"],
-            uploader_profile_image_url=video.get("uploader_profile_image_url"),
-            title=video["title"],
-            description=video.get("description"),
-            tags=video.get("tags", []),
-            playlist_url=video["playlist_url"],
-            thumbnail_url=video.get("thumbnail_url"),
-            duration=video.get("duration"),
-            views=video["views"],
-            likes=video["likes"],
-            dislikes=video["dislikes"],
-            saved_count=video["saved_count"],
-            processing_status=video.get("processing_status", "completed"),
-            created_at=format_datetime_response(video["created_at"]),
-            user_interaction=user_interaction,
-            is_nsfw=video.get("is_nsfw", False),
-            last_part_id=video.get("last_part_id"),
-            next_part_id=video.get("next_part_id")
-        )
-        video_list.append(video_response.model_dump())
+        video_list.append(video_doc_to_response_dict(video, user_interaction=user_interaction))
     
-    return APIResponse(
-        status="success",
-        message="Discover feed retrieved successfully",
-        data={
+    return ORJSONResponse({
+        "status": "success",
+        "message": "Discover feed retrieved successfully",
+        "data": {
             "videos": video_list,
             "total": total,
             "page": page,
             "page_size": page_size
         }
-    )
+    })
 
 
 @router.get("/search", response_model=APIResponse)
@@ -821,66 +665,23 @@ async def search_videos(
     total = await db.videos.count_documents(search_query)
     
     # Format videos with user interactions if authenticated
+    await load_user_interactions(db, request, current_user, [str(video["_id"]) for video in videos])
     video_list = []
     for video in videos:
         user_interaction = None
         if current_user:
-            user_id = str(current_user["_id"])
             video_id = str(video["_id"])
-            
-            like = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "interaction_type": "like"
-            })
-            dislike = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "interaction_type": "dislike"
-            })
-            save = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "interaction_type": "save"
-            })
-            
-            user_interaction = {
-                "liked": like is not None,
-                "disliked": dislike is not None,
-                "saved": save is not None
-            }
+            user_interaction = get_user_interaction(request, video_id)
         
-        video_response = VideoResponse(
-            id=str(video["_id"]),
-            uploader_id=video["uploader_id"],
-            uploader_username=video["uploader_username"],
-            uploader_profile_image_url=video.get("uploader_profile_image_url"),
-            title=video["title"],
-            description=video.get("description"),
-            tags=video.get("tags", []),
-            playlist_url=video["playlist_url"],
-            thumbnail_url=video.get("thumbnail_url"),
-            duration=video.get("duration"),
-            views=video["views"],
-            likes=video["likes"],
-            dislikes=video["dislikes"],
-            saved_count=video["saved_count"],
-            processing_status=video.get("processing_status", "completed"),
-            created_at=format_datetime_response(video["created_at"]),
-            user_interaction=user_interaction,
-            is_nsfw=video.get("is_nsfw", False),
-            last_part_id=video.get("last_part_id"),
-            next_part_id=video.get("next_part_id")
-        )
-        video_list.append(video_response.model_dump())
+        video_list.append(video_doc_to_response_dict(video, user_interaction=user_interaction))
     
     # Search for users if requested
     users_list = []
     users_total = 0
     
     if include_users:
-        # Create regex for case-insensitive username search
-        regex_pattern = f".*{query}.*"
+        # Create regex for case-insensitive username search (escaped to prevent regex injection)
+        regex_pattern = re.escape(query)
         users_cursor = db.users.find(
             {
                 "username": {"$regex": regex_pattern, "$options": "i"},
@@ -900,10 +701,10 @@ async def search_videos(
                 "profile_image_url": user.get("profile_image_url")
             })
     
-    return APIResponse(
-        status="success",
-        message=f"Search results for '{query}'",
-        data={
+    return ORJSONResponse({
+        "status": "success",
+        "message": f"Search results for '{query}'",
+        "data": {
             "videos": video_list,
             "users": users_list,
             "total_videos": total,
@@ -912,7 +713,7 @@ async def search_videos(
             "page_size": page_size,
             "query": query
         }
-    )
+    })
 
 
 @router.get("/user/{username}", response_model=APIResponse)
@@ -959,63 +760,20 @@ async def get_user_videos(
     })
     
     # Format videos with user interactions if authenticated
+    await load_user_interactions(db, request, current_user, [str(video["_id"]) for video in videos])
     video_list = []
     for video in videos:
         user_interaction = None
         if current_user:
-            current_user_id = str(current_user["_id"])
             video_id = str(video["_id"])
-            
-            like = await db.interactions.find_one({
-                "user_id": current_user_id,
-                "video_id": video_id,
-                "interaction_type": "like"
-            })
-            dislike = await db.interactions.find_one({
-                "user_id": current_user_id,
-                "video_id": video_id,
-                "interaction_type": "dislike"
-            })
-            save = await db.interactions.find_one({
-                "user_id": current_user_id,
-                "video_id": video_id,
-                "interaction_type": "save"
-            })
-            
-            user_interaction = {
-                "liked": like is not None,
-                "disliked": dislike is not None,
-                "saved": save is not None
-            }
+            user_interaction = get_user_interaction(request, video_id)
         
-        video_response = VideoResponse(
-            id=str(video["_id"]),
-            uploader_id=video["uploader_id"],
-            uploader_username=video["uploader_username"],
-            uploader_profile_image_url=video.get("uploader_profile_image_url"),
-            title=video["title"],
-            description=video.get("description"),
-            tags=video.get("tags", []),
-            playlist_url=video["playlist_url"],
-            thumbnail_url=video.get("thumbnail_url"),
-            duration=video.get("duration"),
-            views=video["views"],
-            likes=video["likes"],
-            dislikes=video["dislikes"],
-            saved_count=video["saved_count"],
-            processing_status=video.get("processing_status", "completed"),
-            created_at=format_datetime_response(video["created_at"]),
-            user_interaction=user_interaction,
-            is_nsfw=video.get("is_nsfw", False),
-            last_part_id=video.get("last_part_id"),
-            next_part_id=video.get("next_part_id")
-        )
-        video_list.append(video_response.model_dump())
+        video_list.append(video_doc_to_response_dict(video, user_interaction=user_interaction))
     
-    return APIResponse(
-        status="success",
-        message=f"Videos by {username} retrieved successfully",
-        data={
+    return ORJSONResponse({
+        "status": "success",
+        "message": f"Videos by {username} retrieved successfully",
+        "data": {
             "videos": video_list,
             "total": total,
             "page": page,
@@ -1025,5 +783,5 @@ async def get_user_videos(
                 "username": username
             }
         }
-    )
+    })
 
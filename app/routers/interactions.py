@@ -1,107 +1,150 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Request, Response
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, timezone
+from typing import Optional, Tuple
 from app.schemas import InteractionResponse, ReportCreate, APIResponse
 from app.auth import get_current_user
 from app.database import get_database
 from app.utils.datetime_helper import format_datetime_response
+from app.utils.cache import video_response_cache
+from app.utils.video_helper import get_active_video, valid_video_oid
+from app.utils.interaction_helper import INTERACTION_FIELDS
 from app.utils.rate_limit import limiter, RATE_LIMIT_VIDEO_INTERACTION, RATE_LIMIT_REPORT
 
 router = APIRouter(prefix="/interactions", tags=["interactions"])
 
 
+# Interaction type -> counter field on the video document
+INTERACTION_COUNTERS = {
+    "like": "likes",
+    "dislike": "dislikes",
+    "save": "saved_count"
+}
+
+
+async def remove_interaction(db, user: dict, video_id: str, video_oid: ObjectId, interaction_type: str) -> Optional[dict]:
+    """
+    Remove one of the user's interactions with a video.
+    The $pull only matches while the video ID is still in the user's array, so of several
+    concurrent toggles (on any worker) exactly one sees modified_count == 1 and adjusts the
+    counter. Returns the video's updated counter, or None if the interaction wasn't set.
+    """
+    field = INTERACTION_FIELDS[interaction_type]
+    result = await db.users.update_one(
+        {"_id": user["_id"], field: video_id},
+        {"$pull": {field: video_id}}
+    )
+    if result.modified_count != 1:
+        return None
+    
+    await db.interactions.delete_one({
+        "user_id": str(user["_id"]),
+        "video_id": video_id,
+        "interaction_type": interaction_type
+    })
+    counter = INTERACTION_COUNTERS[interaction_type]
+    # Decrement and read back the new count in one round trip
+    return await db.videos.find_one_and_update(
+        {"_id": video_oid},
+        {"$inc": {counter: -1}},
+        projection={counter: 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def add_interaction(db, user: dict, video_id: str, video_oid: ObjectId, interaction_type: str) -> Optional[dict]:
+    """
+    Add an interaction, the counterpart of remove_interaction: only the request whose
+    $addToSet actually changed the array records it and increments the counter.
+    Returns the video's updated counter, or None if the interaction was already set.
+    """
+    field = INTERACTION_FIELDS[interaction_type]
+    result = await db.users.update_one(
+        {"_id": user["_id"], field: {"$ne": video_id}},
+        {"$addToSet": {field: video_id}}
+    )
+    if result.modified_count != 1:
+        return None
+    
+    counter = INTERACTION_COUNTERS[interaction_type]
+    try:
+        await db.interactions.insert_one({
+            "user_id": str(user["_id"]),
+            "video_id": video_id,
+            "interaction_type": interaction_type,
+            "created_at": datetime.now(timezone.utc)
+        })
+    except DuplicateKeyError:
+        # The row (and its count) already exists, e.g. left by an interrupted toggle; don't count it twice
+        return await db.videos.find_one({"_id": video_oid}, {counter: 1})
+    # Increment and read back the new count in one round trip
+    return await db.videos.find_one_and_update(
+        {"_id": video_oid},
+        {"$inc": {counter: 1}},
+        projection={counter: 1},
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def toggle_interaction(db, user: dict, video_id: str, video_oid: ObjectId, interaction_type: str, opposite_type: Optional[str] = None) -> Tuple[str, int]:
+    """
+    Toggle an interaction off if it is set, otherwise on (clearing opposite_type first).
+    Every step is decided by the result of its own conditional write, never by cached state.
+    Returns the action taken and the video's new counter value.
+    """
+    counter = INTERACTION_COUNTERS[interaction_type]
+    updated_video = await remove_interaction(db, user, video_id, video_oid, interaction_type)
+    if updated_video is not None:
+        action = "removed"
+    else:
+        if opposite_type:
+            await remove_interaction(db, user, video_id, video_oid, opposite_type)
+        updated_video = await add_interaction(db, user, video_id, video_oid, interaction_type)
+        if updated_video is None:
+            # A concurrent request added it first; report the count it left behind
+            updated_video = await db.videos.find_one({"_id": video_oid}, {counter: 1})
+        action = "added"
+    
+    video_response_cache.invalidate(video_id)
+    return action, updated_video[counter] if updated_video else 0
+
+
 @router.post("/videos/{video_id}/like", response_model=APIResponse)
 @limiter.limit(RATE_LIMIT_VIDEO_INTERACTION)
 async def like_video(
     request: Request,
     response: Response,
     video_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    video_oid: ObjectId = Depends(valid_video_oid)
 ):
     """
     Like a video (toggle - like/unlike)
     Rate limit: 100 per hour per IP
     """
     db = get_database()
-    user_id = str(current_user["_id"])
-    
-    # Validate video_id
-    if not ObjectId.is_valid(video_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid video ID"
-        )
     
     # Check if video exists
-    video = await db.videos.find_one({"_id": ObjectId(video_id), "is_active": True})
+    video = await get_active_video(db, video_id, video_oid)
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Video not found"
         )
     
-    # Check if user already liked
-    existing_like = await db.interactions.find_one({
-        "user_id": user_id,
-        "video_id": video_id,
-        "interaction_type": "like"
-    })
-    
-    # Remove dislike if exists
-    existing_dislike = await db.interactions.find_one({
-        "user_id": user_id,
-        "video_id": video_id,
-        "interaction_type": "dislike"
-    })
-    
-    if existing_dislike:
-        await db.interactions.delete_one({"_id": existing_dislike["_id"]})
-        await db.videos.update_one(
-            {"_id": ObjectId(video_id)},
-            {"$inc": {"dislikes": -1}}
-        )
+    # Liking removes an existing dislike
+    action, new_count = await toggle_interaction(db, current_user, video_id, video_oid, "like", opposite_type="dislike")
     
-    if existing_like:
-        # Unlike
-        await db.interactions.delete_one({"_id": existing_like["_id"]})
-        await db.videos.update_one(
-            {"_id": ObjectId(video_id)},
-            {"$inc": {"likes": -1}}
-        )
-        
-        updated_video = await db.videos.find_one({"_id": ObjectId(video_id)})
-        
-        return APIResponse(
-            status="success",
-            message="Video unliked",
-            data={
-                "action": "removed",
-                "new_count": updated_video["likes"]
-            }
-        )
-    else:
-        # Like
-        await db.interactions.insert_one({
-            "user_id": user_id,
-            "video_id": video_id,
-            "interaction_type": "like",
-            "created_at": datetime.now(timezone.utc)
-        })
-        await db.videos.update_one(
-            {"_id": ObjectId(video_id)},
-            {"$inc": {"likes": 1}}
-        )
-        
-        updated_video = await db.videos.find_one({"_id": ObjectId(video_id)})
-        
-        return APIResponse(
-            status="success",
-            message="Video liked",
-            data={
-                "action": "added",
-                "new_count": updated_video["likes"]
-            }
-        )
+    return APIResponse(
+        status="success",
+        message="Video unliked" if action == "removed" else "Video liked",
+        data={
+            "action": action,
+            "new_count": new_count
+        }
+    )
 
 
 @router.post("/videos/{video_id}/dislike", response_model=APIResponse)
@@ -110,92 +153,34 @@ async def dislike_video(
     request: Request,
     response: Response,
     video_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    video_oid: ObjectId = Depends(valid_video_oid)
 ):
     """
     Dislike a video (toggle - dislike/undislike)
     Rate limit: 100 per hour per IP
     """
     db = get_database()
-    user_id = str(current_user["_id"])
-    
-    # Validate video_id
-    if not ObjectId.is_valid(video_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid video ID"
-        )
     
     # Check if video exists
-    video = await db.videos.find_one({"_id": ObjectId(video_id), "is_active": True})
+    video = await get_active_video(db, video_id, video_oid)
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Video not found"
         )
     
-    # Check if user already disliked
-    existing_dislike = await db.interactions.find_one({
-        "user_id": user_id,
-        "video_id": video_id,
-        "interaction_type": "dislike"
-    })
-    
-    # Remove like if exists
-    existing_like = await db.interactions.find_one({
-        "user_id": user_id,
-        "video_id": video_id,
-        "interaction_type": "like"
-    })
-    
-    if existing_like:
-        await db.interactions.delete_one({"_id": existing_like["_id"]})
-        await db.videos.update_one(
-            {"_id": ObjectId(video_id)},
-            {"$inc": {"likes": -1}}
-        )
+    # Disliking removes an existing like
+    action, new_count = await toggle_interaction(db, current_user, video_id, video_oid, "dislike", opposite_type="like")
     
-    if existing_dislike:
-        # Undislike
-        await db.interactions.delete_one({"_id": existing_dislike["_id"]})
-        await db.videos.update_one(
-            {"_id": ObjectId(video_id)},
-            {"$inc": {"dislikes": -1}}
-        )
-        
-        updated_video = await db.videos.find_one({"_id": ObjectId(video_id)})
-        
-        return APIResponse(
-            status="success",
-            message="Video undisliked",
-            data={
-                "action": "removed",
-                "new_count": updated_video["dislikes"]
-            }
-        )
-    else:
-        # Dislike
-        await db.interactions.insert_one({
-            "user_id": user_id,
-            "video_id": video_id,
-            "interaction_type": "dislike",
-            "created_at": datetime.now(timezone.utc)
-        })
-        await db.videos.update_one(
-            {"_id": ObjectId(video_id)},
-            {"$inc": {"dislikes": 1}}
-        )
-        
-        updated_video = await db.videos.find_one({"_id": ObjectId(video_id)})
-        
-        return APIResponse(
-            status="success",
-            message="Video disliked",
-            data={
-                "action": "added",
-                "new_count": updated_video["dislikes"]
-            }
-        )
+    return APIResponse(
+        status="success",
+        message="Video undisliked" if action == "removed" else "Video disliked",
+        data={
+            "action": action,
+            "new_count": new_count
+        }
+    )
 
 
 @router.post("/videos/{video_id}/save", response_model=APIResponse)
@@ -204,78 +189,33 @@ async def save_video(
     request: Request,
     response: Response,
     video_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    video_oid: ObjectId = Depends(valid_video_oid)
 ):
     """
     Save/bookmark a video (toggle - save/unsave)
     Rate limit: 100 per hour per IP
     """
     db = get_database()
-    user_id = str(current_user["_id"])
-    
-    # Validate video_id
-    if not ObjectId.is_valid(video_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid video ID"
-        )
     
     # Check if video exists
-    video = await db.videos.find_one({"_id": ObjectId(video_id), "is_active": True})
+    video = await get_active_video(db, video_id, video_oid)
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Video not found"
         )
     
-    # Check if user already saved
-    existing_save = await db.interactions.find_one({
-        "user_id": user_id,
-        "video_id": video_id,
-        "interaction_type": "save"
-    })
+    action, new_count = await toggle_interaction(db, current_user, video_id, video_oid, "save")
     
-    if existing_save:
-        # Unsave
-        await db.interactions.delete_one({"_id": existing_save["_id"]})
-        await db.videos.update_one(
-            {"_id": ObjectId(video_id)},
-            {"$inc": {"saved_count": -1}}
-        )
-        
-        updated_video = await db.videos.find_one({"_id": ObjectId(video_id)})
-        
-        return APIResponse(
-            status="success",
-            message="Video removed from saved",
-            data={
-                "action": "removed",
-                "new_count": updated_video["saved_count"]
-            }
-        )
-    else:
-        # Save
-        await db.interactions.insert_one({
-            "user_id": user_id,
-            "video_id": video_id,
-            "interaction_type": "save",
-            "created_at": datetime.now(timezone.utc)
-        })
-        await db.videos.update_one(
-            {"_id": ObjectId(video_id)},
-            {"$inc": {"saved_count": 1}}
-        )
-        
-        updated_video = await db.videos.find_one({"_id": ObjectId(video_id)})
-        
-        return APIResponse(
-            status="success",
-            message="Video saved",
-            data={
-                "action": "added",
-                "new_count": updated_video["saved_count"]
-            }
-        )
+    return APIResponse(
+        status="success",
+        message="Video removed from saved" if action == "removed" else "Video saved",
+        data={
+            "action": action,
+            "new_count": new_count
+        }
+    )
 
 
 @router.post("/videos/{video_id}/report", response_model=APIResponse, status_code=status.HTTP_201_CREATED)
@@ -285,7 +225,8 @@ async def report_video(
     response: Response,
     video_id: str,
     report_data: ReportCreate,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    video_oid: ObjectId = Depends(valid_video_oid)
 ):
     """
     Report a video
@@ -294,15 +235,8 @@ async def report_video(
     db = get_database()
     user_id = str(current_user["_id"])
     
-    # Validate video_id
-    if not ObjectId.is_valid(video_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid video ID"
-        )
-    
     # Check if video exists
-    video = await db.videos.find_one({"_id": ObjectId(video_id), "is_active": True})
+    video = await get_active_video(db, video_id, video_oid)
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1,11 +1,14 @@
 from fastapi import APIRouter, HTTPException, status, Depends, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from typing import Optional, List
 from datetime import datetime, timezone, timedelta
 from bson import ObjectId
+import re
 from app.schemas import APIResponse
 from app.auth import get_current_user, get_current_user_optional
 from app.database import get_database
 from app.utils.datetime_helper import format_datetime_response
+from app.utils.interaction_helper import get_user_interaction, load_user_interactions
 from app.utils.rate_limit import limiter, RATE_LIMIT_READ
 
 router = APIRouter(prefix="/tags", tags=["tags"])
@@ -101,8 +104,8 @@ async def suggest_tags(
     """
     db = get_database()
     
-    # Create case-insensitive regex for the query
-    regex_pattern = f"^{query}"
+    # Create case-insensitive prefix regex for the query (escaped to prevent regex injection)
+    regex_pattern = f"^{re.escape(query)}"
     
     # Aggregate to find matching tags
     pipeline = [
@@ -164,7 +167,7 @@ async def explore_by_tag(
     
     # Find videos with the specified tag
     query = {
-        "tags": {"$regex": f"^{tag}$", "$options": "i"},
+        "tags": {"$regex": f"^{re.escape(tag)}$", "$options": "i"},
         "is_active": True
     }
     
@@ -176,33 +179,13 @@ async def explore_by_tag(
     videos = await videos_cursor.to_list(length=page_size)
     
     # Format response
+    await load_user_interactions(db, request, current_user, [str(video["_id"]) for video in videos])
     video_responses = []
     for video in videos:
         # Get user interaction if authenticated
         user_interaction = None
         if current_user:
-            user_id = str(current_user["_id"])
-            like = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": str(video["_id"]),
-                "interaction_type": "like"
-            })
-            dislike = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": str(video["_id"]),
-                "interaction_type": "dislike"
-            })
-            save = await db.interactions.find_one({
-                "user_id": user_id,
-                "video_id": str(video["_id"]),
-                "interaction_type": "save"
-            })
-            
-            user_interaction = {
-                "liked": like is not None,
-                "disliked": dislike is not None,
-                "saved": save is not None
-            }
+            user_interaction = get_user_interaction(request, str(video["_id"]))
         
         video_responses.append({
             "id": str(video["_id"]),
@@ -224,14 +207,14 @@ async def explore_by_tag(
             "user_interaction": user_interaction
         })
     
-    return APIResponse(
-        status="success",
-        message=f"Videos with tag '{tag}' retrieved",
-        data={
+    return ORJSONResponse({
+        "status": "success",
+        "message": f"Videos with tag '{tag}' retrieved",
+        "data": {
             "videos": video_responses,
             "total": total_videos,
             "page": page,
             "page_size": page_size,
             "tag": tag
         }
-    )
+    })
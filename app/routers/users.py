@@ -1,11 +1,14 @@
 from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Request, Response
+from fastapi.responses import ORJSONResponse
 from datetime import timedelta
-from bson import ObjectId
-from app.schemas import UserRegister, UserLogin, Token, UserProfile, UserProfileUpdate, APIResponse
-from app.auth import get_password_hash, verify_password, create_access_token, get_current_user
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.schemas import UserRegister, UserLogin, Token, UserProfileUpdate, APIResponse, USER_PROFILE_PROJECTION
+from app.auth import get_password_hash_async, verify_password_async, create_access_token, get_current_user, DUMMY_PASSWORD_HASH
 from app.database import get_database
 from app.config import settings
 from app.utils.storage import r2_storage
+from app.utils.cache import profile_cache, user_cache
 from app.models import NSFWPreference
 from app.utils.datetime_helper import format_datetime_response
 from app.utils.rate_limit import (
@@ -19,6 +22,29 @@ from app.utils.rate_limit import (
 
 router = APIRouter(prefix="/users", tags=["users"])
 
+# Allowed avatar content types -> object key extension (the client's filename never reaches the key)
+AVATAR_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp"
+}
+
+
+def user_doc_to_profile_dict(user: dict, show_nsfw=NSFWPreference.ASK) -> dict:
+    """Build the UserProfile-shaped dict for a trusted user document without Pydantic validation"""
+    return {
+        "id": str(user["_id"]),
+        "username": user["username"],
+        "email": user.get("email"),
+        "full_name": user.get("full_name"),
+        "bio": user.get("bio"),
+        "profile_image_url": user.get("profile_image_url"),
+        "created_at": format_datetime_response(user["created_at"]),
+        "show_nsfw": show_nsfw
+    }
+
 
 @router.post("/register", response_model=APIResponse, status_code=status.HTTP_201_CREATED)
 @limiter.limit(RATE_LIMIT_REGISTER)
@@ -29,30 +55,33 @@ async def register_user(request: Request, response: Response, user_data: UserReg
     """
     db = get_database()
     
-    # Check if username already exists
-    existing_username = await db.users.find_one({"username": user_data.username})
-    if existing_username:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already taken"
-        )
-    
     # Create user
     user_dict = {
         "username": user_data.username,
         "email": None,
-        "hashed_password": get_password_hash(user_data.password),
+        "hashed_password": await get_password_hash_async(user_data.password),
         "full_name": None,
         "bio": None,
         "profile_image_url": None,
         "is_active": True,
-        "show_nsfw": NSFWPreference.ASK  # Default to ask before showing NSFW content
+        "show_nsfw": NSFWPreference.ASK,  # Default to ask before showing NSFW content
+        "liked_videos": [],
+        "disliked_videos": [],
+        "saved_videos": []
     }
     
     from datetime import datetime, timezone
     user_dict["created_at"] = datetime.now(timezone.utc)
     
-    result = await db.users.insert_one(user_dict)
+    # Rely on the unique username index instead of a find-then-insert check,
+    # which could race with a concurrent registration
+    try:
+        result = await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already taken"
+        )
     
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -86,13 +115,15 @@ async def login_user(request: Request, response: Response, user_data: UserLogin)
     # Find user by username
     user = await db.users.find_one({"username": user_data.username})
     if not user:
+        # Still run a bcrypt check so unknown usernames can't be detected by response timing
+        await verify_password_async(user_data.password, DUMMY_PASSWORD_HASH)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
     
     # Verify password
-    if not verify_password(user_data.password, user["hashed_password"]):
+    if not await verify_password_async(user_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
@@ -138,22 +169,12 @@ async def get_user_profile(request: Request, response: Response, current_user: d
         # Convert legacy boolean to enum
         show_nsfw_value = NSFWPreference.SHOW if show_nsfw_value else NSFWPreference.HIDE
     
-    profile = UserProfile(
-        id=str(current_user["_id"]),
-        username=current_user["username"],
-        email=current_user.get("email"),
-        full_name=current_user.get("full_name"),
-        bio=current_user.get("bio"),
-        profile_image_url=current_user.get("profile_image_url"),
-        created_at=format_datetime_response(current_user["created_at"]),
-        show_nsfw=show_nsfw_value
-    )
-    
-    return APIResponse(
-        status="success",
-        message="Profile retrieved successfully",
-        data={"profile": profile.model_dump()}
-    )
+    # Build the JSON body directly and skip the response_model re-validation
+    return ORJSONResponse({
+        "status": "success",
+        "message": "Profile retrieved successfully",
+        "data": {"profile": user_doc_to_profile_dict(current_user, show_nsfw_value)}
+    })
 
 
 @router.get("/profile/{username}", response_model=APIResponse)
@@ -163,30 +184,26 @@ async def get_user_profile_by_username(request: Request, response: Response, use
     Get user profile by username (public endpoint)
     Rate limit: 500 per hour per IP
     """
-    db = get_database()
-    
-    user = await db.users.find_one({"username": username})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
-    
-    profile = UserProfile(
-        id=str(user["_id"]),
-        username=user["username"],
-        email=user.get("email"),
-        full_name=user.get("full_name"),
-        bio=user.get("bio"),
-        profile_image_url=user.get("profile_image_url"),
-        created_at=format_datetime_response(user["created_at"])
-    )
+    # Serve from the short-lived in-process cache when possible
+    profile_data = profile_cache.get(username)
+    if profile_data is None:
+        db = get_database()
+        
+        user = await db.users.find_one({"username": username}, USER_PROFILE_PROJECTION)
+        if not user:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="User not found"
+            )
+        
+        profile_data = user_doc_to_profile_dict(user)
+        profile_cache.set(username, profile_data)
     
-    return APIResponse(
-        status="success",
-        message="Profile retrieved successfully",
-        data={"profile": profile.model_dump()}
-    )
+    return ORJSONResponse({
+        "status": "success",
+        "message": "Profile retrieved successfully",
+        "data": {"profile": profile_data}
+    })
 
 
 @router.put("/profile", response_model=APIResponse)
@@ -214,34 +231,28 @@ async def update_user_profile(
     if profile_data.show_nsfw is not None:
         update_fields["show_nsfw"] = profile_data.show_nsfw
     
+    # _id comes straight from Mongo, so it is already an ObjectId
+    user_oid = current_user["_id"]
+    
     # If no fields to update, return current profile
     if not update_fields:
         updated_user = current_user
     else:
-        # Update user in database
-        await db.users.update_one(
-            {"_id": ObjectId(current_user["_id"])},
-            {"$set": update_fields}
+        # Update user and read back the new document in one round trip
+        updated_user = await db.users.find_one_and_update(
+            {"_id": user_oid},
+            {"$set": update_fields},
+            projection={"hashed_password": 0},
+            return_document=ReturnDocument.AFTER
         )
-        
-        # Fetch updated user
-        updated_user = await db.users.find_one({"_id": ObjectId(current_user["_id"])})
+        profile_cache.invalidate(current_user["username"])
+        user_cache.invalidate(str(current_user["_id"]))
     
     # Return updated profile
-    profile = UserProfile(
-        id=str(updated_user["_id"]),
-        username=updated_user["username"],
-        email=updated_user.get("email"),
-        full_name=updated_user.get("full_name"),
-        bio=updated_user.get("bio"),
-        profile_image_url=updated_user.get("profile_image_url"),
-        created_at=format_datetime_response(updated_user["created_at"])
-    )
-    
     return APIResponse(
         status="success",
         message="Profile updated successfully",
-        data={"profile": profile.model_dump()}
+        data={"profile": user_doc_to_profile_dict(updated_user)}
     )
 
 
@@ -258,8 +269,7 @@ async def upload_avatar(
     Rate limit: 5 per hour per IP
     """
     # Validate file type
-    allowed_image_types = ["image/jpeg", "image/jpg", "image/png", "image/gif", "image/webp"]
-    if file.content_type not in allowed_image_types:
+    if file.content_type not in AVATAR_EXTENSIONS:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid file type. Only JPEG, PNG, GIF, and WebP images are allowed"
@@ -278,16 +288,18 @@ async def upload_avatar(
         # Upload to R2
         avatar_url = await r2_storage.upload_file(
             file_data=file_data,
-            filename=f"avatar_{current_user['username']}_{file.filename}",
+            filename=f"avatar_{current_user['_id']}{AVATAR_EXTENSIONS[file.content_type]}",
             content_type=file.content_type
         )
         
         # Update user's profile_image_url in database
         db = get_database()
         await db.users.update_one(
-            {"_id": ObjectId(current_user["_id"])},
+            {"_id": current_user["_id"]},
             {"$set": {"profile_image_url": avatar_url}}
         )
+        profile_cache.invalidate(current_user["username"])
+        user_cache.invalidate(str(current_user["_id"]))
         
         return APIResponse(
             status="success",
@@ -1,22 +1,38 @@
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Form, Query, Request, Response
+from fastapi import APIRouter, BackgroundTasks, HTTPException, status, Depends, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import ORJSONResponse
 from typing import Optional, List
 from bson import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime, timezone, timedelta
+import asyncio
 import tempfile
+import shutil
 import os
-import re
-from app.schemas import VideoUpload, VideoResponse, APIResponse
+from app.schemas import VideoUpload, APIResponse, VIDEO_RESPONSE_PROJECTION, HTML_TAG_RE, sanitize_tag
 from app.auth import get_current_user, get_current_user_optional
 from app.database import get_database
-from app.utils.storage import r2_storage
+from app.utils.cache import video_cache, video_response_cache
 from app.utils.video_processing import video_processor
-from app.utils.video_queue import video_queue
+from app.utils.video_queue import video_queue, claim_raw_video, PROCESSING_HOST
+from app.utils.view_counter import view_counter
+from app.utils.video_helper import get_active_video, valid_video_oid, video_doc_to_response_dict
 from app.config import settings
-from app.utils.datetime_helper import format_datetime_response
+from app.utils.interaction_helper import get_user_interaction, load_user_interactions, sweep_video_interactions
 from app.utils.rate_limit import limiter, RATE_LIMIT_VIDEO_UPLOAD, RATE_LIMIT_READ, RATE_LIMIT_PROFILE_UPDATE
 
 router = APIRouter(prefix="/videos", tags=["videos"])
 
+MAX_TAGS = 10  # Matches the max_items limit on VideoUpload.tags
+
+
+def save_upload_to_temp_file(file_obj) -> str:
+    """Copy an uploaded file to a temp file that outlives the request and return its path"""
+    file_obj.seek(0)
+    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
+        shutil.copyfileobj(file_obj, tmp_file, 1024 * 1024)
+        return tmp_file.name
+
 
 @router.post("/upload", response_model=APIResponse, status_code=status.HTTP_201_CREATED)
 @limiter.limit(RATE_LIMIT_VIDEO_UPLOAD)
@@ -39,77 +55,64 @@ async def upload_video(
     db = get_database()
     
     # Validate file type
-    if video.content_type not in settings.allowed_video_types_list:
+    if video.content_type not in settings.allowed_video_types:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Invalid video format"
         )
     
-    # Read file
-    video_content = await video.read()
-    file_size = len(video_content)
+    # Measure the file without reading it into memory (Starlette spools uploads to disk)
+    file_size = video.size
+    if file_size is None:
+        video.file.seek(0, os.SEEK_END)
+        file_size = video.file.tell()
+        video.file.seek(0)
     
     # Validate file size
     if file_size > settings.max_video_size_bytes:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
             detail=f"Video size exceeds maximum limit of {settings.MAX_VIDEO_SIZE_MB}MB"
         )
     
+    # Start copying the spooled upload to a temp file the processing worker will own;
+    # the disk copy overlaps with the last_part_id lookup and document prep below
+    loop = asyncio.get_running_loop()
+    copy_future = loop.run_in_executor(None, save_upload_to_temp_file, video.file)
+    raw_video_lock = None
+    queued = False
+    
     try:
-        # Validate and check last_part_id if provided
-        if last_part_id:
-            if not ObjectId.is_valid(last_part_id):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Invalid last_part_id"
-                )
-            
-            # Check if the referenced video exists and belongs to the same user
-            last_part_video = await db.videos.find_one({
-                "_id": ObjectId(last_part_id),
-                "uploader_id": str(current_user["_id"]),
-                "is_active": True
-            })
-            
-            if not last_part_video:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND,
-                    detail="Referenced video not found or doesn't belong to you"
-                )
-            
-            # Check if the last part already has a next part
-            if last_part_video.get("next_part_id"):
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="The referenced video already has a next part. Please reference the latest part in the series."
-                )
-        
-        # Parse and sanitize tags
-        tags_list = []
-        if tags:
-            # Split by comma and sanitize each tag
-            for tag in tags.split(','):
-                tag = tag.strip()
-                if tag:
-                    # Only allow alphanumeric and some punctuation in tags
-                    clean_tag = re.sub(r'[^\w\s\-]', '', tag).strip()
-                    if clean_tag:  # Only add non-empty tags
-                        tags_list.append(clean_tag)
+        # Validate last_part_id if provided; ownership and the free next_part_id slot are
+        # checked atomically by the conditional update after the insert
+        if last_part_id and not ObjectId.is_valid(last_part_id):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid last_part_id"
+            )
         
-        # Upload RAW video to R2 first (for queue processing later)
-        raw_video_filename = f"raw_{datetime.now(timezone.utc).timestamp()}_{video.filename}"
-        raw_video_url = await r2_storage.upload_file(
-            video_content,
-            raw_video_filename,
-            video.content_type
-        )
+        # Parse and sanitize comma-separated tags (only alphanumeric and some punctuation),
+        # dropping empty and repeated ones and keeping at most MAX_TAGS like the VideoUpload schema
+        tags_list = list(dict.fromkeys(
+            clean_tag
+            for clean_tag in (sanitize_tag(tag) for tag in (tags or "").split(','))
+            if clean_tag
+        ))[:MAX_TAGS]
         
         # Sanitize inputs
-        sanitized_title = re.sub(r'<[^>]*>', '', title).strip()
+        sanitized_title = HTML_TAG_RE.sub('', title).strip()
         sanitized_description = None
         if description:
-            sanitized_description = re.sub(r'<[^>]*>', '', description)
+            sanitized_description = HTML_TAG_RE.sub('', description)
+        
+        # Single timestamp shared by the document's timestamps and the series relink
+        now = datetime.now(timezone.utc)
+        
+        # The raw video is handed to the processing worker as a local temp file instead of
+        # being uploaded to R2 only for the worker to download it again
+        raw_video_path = await copy_future
+        # Lock it before the document exists, so startup recovery in a sibling worker can't take it
+        raw_video_lock = claim_raw_video(raw_video_path)
         
         # Create video document with "pending" status
         video_doc = {
@@ -119,64 +122,78 @@ async def upload_video(
             "title": sanitized_title,
             "description": sanitized_description,
             "tags": tags_list,
-            "playlist_url": raw_video_url,  # Store raw video URL temporarily
+            "playlist_url": "",  # Set to the HLS master playlist once processing completes
             "thumbnail_url": None,
             "duration": None,
             "file_size": file_size,
+            "original_filename": video.filename,
             "views": 0,
             "likes": 0,
             "dislikes": 0,
             "saved_count": 0,
             "processing_status": "pending",
-            "created_at": datetime.now(timezone.utc),
-            "updated_at": datetime.now(timezone.utc),
+            "created_at": now,
+            "updated_at": now,
             "is_active": True,
             "is_nsfw": is_nsfw,
             "last_part_id": last_part_id,
-            "next_part_id": None
+            "next_part_id": None,
+            # Where the raw upload waits for processing, for recovery after a restart
+            "raw_video_path": raw_video_path,
+            "processing_host": PROCESSING_HOST
         }
         
         result = await db.videos.insert_one(video_doc)
         video_id = str(result.inserted_id)
         
-        # If this video references a previous part, update that video's next_part_id
+        # If this video references a previous part, claim that video's next_part_id slot.
+        # The filter only matches an active video owned by this user without a next part yet,
+        # so concurrent uploads can't both link to the same part
         if last_part_id:
-            await db.videos.update_one(
-                {"_id": ObjectId(last_part_id)},
-                {"$set": {"next_part_id": video_id, "updated_at": datetime.now(timezone.utc)}}
+            link_result = await db.videos.update_one(
+                {
+                    "_id": ObjectId(last_part_id),
+                    "uploader_id": str(current_user["_id"]),
+                    "is_active": True,
+                    "next_part_id": None
+                },
+                {"$set": {"next_part_id": video_id, "updated_at": now}}
             )
+            
+            if link_result.modified_count == 0:
+                # Roll back the new video, then work out which precondition failed
+                await db.videos.delete_one({"_id": result.inserted_id})
+                last_part_video = await db.videos.find_one({
+                    "_id": ObjectId(last_part_id),
+                    "uploader_id": str(current_user["_id"]),
+                    "is_active": True
+                }, {"_id": 1})
+                
+                if not last_part_video:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail="Referenced video not found or doesn't belong to you"
+                    )
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="The referenced video already has a next part. Please reference the latest part in the series."
+                )
+            
+            video_response_cache.invalidate(last_part_id)
         
-        # Add to processing queue
-        await video_queue.add_to_queue(video_id, raw_video_url)
-        
-        # Return immediately
-        video_response = VideoResponse(
-            id=video_id,
-            uploader_id=video_doc["uploader_id"],
-            uploader_username=video_doc["uploader_username"],
-            uploader_profile_image_url=video_doc.get("uploader_profile_image_url"),
-            title=video_doc["title"],
-            description=video_doc["description"],
-            tags=video_doc["tags"],
-            playlist_url=video_doc["playlist_url"],
-            thumbnail_url=video_doc["thumbnail_url"],
-            duration=video_doc["duration"],
-            views=video_doc["views"],
-            likes=video_doc["likes"],
-            dislikes=video_doc["dislikes"],
-            saved_count=video_doc["saved_count"],
-            processing_status=video_doc["processing_status"],
-            created_at=format_datetime_response(video_doc["created_at"]),
-            is_nsfw=video_doc["is_nsfw"],
-            last_part_id=video_doc.get("last_part_id"),
-            next_part_id=video_doc.get("next_part_id")
-        )
+        # Add to processing queue (the worker owns and removes the temp file from here on)
+        await video_queue.add_to_queue(result.inserted_id, raw_video_path, raw_video_lock)
+        queued = True
         
-        return APIResponse(
-            status="success",
-            message=f"Video uploaded successfully! Processing in queue (position: {video_queue.get_queue_size()})",
-            data={"video": video_response.model_dump()}
-        )
+        # Return immediately, dumping straight to JSON types without response_model re-validation
+        return ORJSONResponse({
+            "status": "success",
+            "message": f"Video uploaded successfully! Processing in queue (position: {video_queue.get_queue_size()})",
+            "data": {"video": video_doc_to_response_dict(video_doc, video_id)}
+        }, status_code=status.HTTP_201_CREATED)
+    
+    except HTTPException:
+        raise
     
     except Exception as e:
         # Log the full error for debugging
@@ -197,6 +214,16 @@ async def upload_video(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to upload video. Please try again."
         )
+    
+    finally:
+        # Remove the raw temp file if it never reached the processing queue
+        if not queued:
+            if raw_video_lock is not None:
+                os.close(raw_video_lock)
+            try:
+                os.unlink(await copy_future)
+            except Exception:
+                pass
 
 
 @router.get("/{video_id}/status", response_model=APIResponse)
@@ -205,7 +232,8 @@ async def get_video_processing_status(
     request: Request,
     response: Response,
     video_id: str,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    video_oid: ObjectId = Depends(valid_video_oid)
 ):
     """
     Get video processing status (authenticated users only)
@@ -213,15 +241,18 @@ async def get_video_processing_status(
     """
     db = get_database()
     
-    # Validate video_id
-    if not ObjectId.is_valid(video_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid video ID"
-        )
-    
     # Get video
-    video = await db.videos.find_one({"_id": ObjectId(video_id)})
+    video = await db.videos.find_one(
+        {"_id": video_oid},
+        {
+            "uploader_id": 1,
+            "processing_status": 1,
+            "processing_error": 1,
+            "title": 1,
+            "created_at": 1,
+            "updated_at": 1
+        }
+    )
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -260,7 +291,8 @@ async def track_video_view(
     request: Request,
     response: Response,
     video_id: str,
-    current_user: Optional[dict] = Depends(get_current_user_optional)
+    current_user: Optional[dict] = Depends(get_current_user_optional),
+    video_oid: ObjectId = Depends(valid_video_oid)
 ):
     """
     Track a video view (call when video starts playing)
@@ -270,26 +302,16 @@ async def track_video_view(
     """
     db = get_database()
     
-    # Validate video_id
-    if not ObjectId.is_valid(video_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid video ID"
-        )
-    
     # Check if video exists
-    video = await db.videos.find_one({"_id": ObjectId(video_id), "is_active": True})
+    video = await get_active_video(db, video_id, video_oid)
     if not video:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Video not found"
         )
     
-    # Increment view count
-    await db.videos.update_one(
-        {"_id": ObjectId(video_id)},
-        {"$inc": {"views": 1}}
-    )
+    # Count the view in memory; the counter flushes batched $inc writes to MongoDB
+    view_counter.increment(video_id)
     
     # If user is authenticated, record to view history
     if current_user:
@@ -297,31 +319,22 @@ async def track_video_view(
         now = datetime.now(timezone.utc)
         expires_at = now + timedelta(days=14)  # History expires after 14 days
         
-        # Check if this view is already recorded
-        existing_view = await db.user_view_history.find_one({
-            "user_id": user_id,
-            "video_id": video_id
-        })
-        
-        if existing_view:
-            # Update the existing view timestamp
+        # Record the view, or refresh its timestamp if already recorded, in one upsert.
+        # The unique index keeps concurrent upserts from inserting two rows; the loser's
+        # view is already recorded by the winner
+        try:
             await db.user_view_history.update_one(
-                {"_id": existing_view["_id"]},
-                {"$set": {"created_at": now, "expires_at": expires_at}}
+                {"user_id": user_id, "video_id": video_id},
+                {"$set": {"created_at": now, "expires_at": expires_at}},
+                upsert=True
             )
-        else:
-            # Record new view
-            await db.user_view_history.insert_one({
-                "user_id": user_id,
-                "video_id": video_id,
-                "created_at": now,
-                "expires_at": expires_at
-            })
+        except DuplicateKeyError:
+            pass
     
     return APIResponse(
         status="success",
         message="View tracked",
-        data={"views": video["views"] + 1}
+        data={"views": view_counter.current_views(video_id, video["views"])}
     )
 
 
@@ -355,87 +368,51 @@ async def search_my_videos(
     if query and query.strip():
         search_query["$text"] = {"$search": query}
     
-    # Get videos
+    # Sort by text relevance when searching, otherwise just by date
+    pipeline = [{"$match": search_query}]
     if query and query.strip():
-        # Use text search with relevance scoring
-        videos_cursor = db.videos.find(
-            search_query,
-            {"score": {"$meta": "textScore"}}
-        ).sort([
-            ("score", {"$meta": "textScore"}),
-            ("created_at", -1)
-        ]).skip(skip).limit(page_size)
+        # Materialize the score before $facet so the sub-pipeline can sort on it
+        pipeline.append({"$addFields": {"score": {"$meta": "textScore"}}})
+        sort_stage = {"$sort": {"score": -1, "created_at": -1}}
     else:
-        # Just get all user's videos sorted by date
-        videos_cursor = db.videos.find(search_query).sort("created_at", -1).skip(skip).limit(page_size)
-    
-    videos = await videos_cursor.to_list(length=page_size)
-    
-    # Get total count
-    total = await db.videos.count_documents(search_query)
+        sort_stage = {"$sort": {"created_at": -1}}
+    
+    # Fetch the page and the total count in one round trip
+    pipeline.append({"$facet": {
+        "videos": [
+            sort_stage,
+            {"$skip": skip},
+            {"$limit": page_size},
+            {"$project": VIDEO_RESPONSE_PROJECTION}
+        ],
+        "total": [{"$count": "count"}]
+    }})
+    facet_result = await db.videos.aggregate(pipeline).to_list(length=1)
+    
+    videos = facet_result[0]["videos"]
+    total = facet_result[0]["total"][0]["count"] if facet_result[0]["total"] else 0
     
     # Format videos with user interactions
+    await load_user_interactions(db, request, current_user, [str(video["_id"]) for video in videos])
     video_list = []
     for video in videos:
         video_id = str(video["_id"])
         
         # Get user interactions
-        like = await db.interactions.find_one({
-            "user_id": user_id,
-            "video_id": video_id,
-            "interaction_type": "like"
-        })
-        dislike = await db.interactions.find_one({
-            "user_id": user_id,
-            "video_id": video_id,
-            "interaction_type": "dislike"
-        })
-        save = await db.interactions.find_one({
-            "user_id": user_id,
-            "video_id": video_id,
-            "interaction_type": "save"
-        })
-        
-        user_interaction = {
-            "liked": like is not None,
-            "disliked": dislike is not None,
-            "saved": save is not None
-        }
+        user_interaction = get_user_interaction(request, video_id)
         
-        video_response = VideoResponse(
-            id=video_id,
-            uploader_id=video["uploader_id"],
-            uploader_username=video["uploader_username"],
-            uploader_profile_image_url=video.get("uploader_profile_image_url"),
-            title=video["title"],
-            description=video.get("description"),
-            tags=video.get("tags", []),
-            playlist_url=video["playlist_url"],
-            thumbnail_url=video.get("thumbnail_url"),
-            duration=video.get("duration"),
-            views=video["views"],
-            likes=video["likes"],
-            dislikes=video["dislikes"],
-            saved_count=video["saved_count"],
-            processing_status=video.get("processing_status", "completed"),
-            created_at=format_datetime_response(video["created_at"]),
-            user_interaction=user_interaction,
-            is_nsfw=video.get("is_nsfw", False),
-            last_part_id=video.get("last_part_id"),
-            next_part_id=video.get("next_part_id")
-        )
-        video_list.append(video_response.model_dump())
+        video_list.append(video_doc_to_response_dict(video, video_id, user_interaction))
     
-    return APIResponse(
-        status="success",
-        message=f"Your videos retrieved successfully" + (f" (search: '{query}')" if query else ""),
-        data={
+    return ORJSONResponse({
+        "status": "success",
+        "message": f"Your videos retrieved successfully" + (f" (search: '{query}')" if query else ""),
+        "data": {
             "videos": video_list,
             "total": total,
             "page": page,
             "page_size": page_size
         }
-    )
+    })
 
 
 @router.get("/{video_id}", response_model=APIResponse)
@@ -444,7 +421,8 @@ async def get_video(
     request: Request,
     response: Response,
     video_id: str,
-    current_user: Optional[dict] = Depends(get_current_user_optional)
+    current_user: Optional[dict] = Depends(get_current_user_optional),
+    video_oid: ObjectId = Depends(valid_video_oid)
 ):
     """
     Get video details (public endpoint, but shows user interaction if authenticated)
@@ -453,16 +431,20 @@ async def get_video(
     """
     db = get_database()
     
-    # Validate video_id
-    if not ObjectId.is_valid(video_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid video ID"
+    async def load_video_data():
+        video = await db.videos.find_one(
+            {"_id": video_oid, "is_active": True},
+            VIDEO_RESPONSE_PROJECTION
         )
+        if not video:
+            return None
+        
+        return video_doc_to_response_dict(video)
     
-    # Get video
-    video = await db.videos.find_one({"_id": ObjectId(video_id), "is_active": True})
-    if not video:
+    # Serve the shared (user-independent) part of the response from the in-process cache;
+    # concurrent misses for the same video share one database query
+    video_data = await video_response_cache.get_or_load(video_id, load_video_data)
+    if video_data is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Video not found"
@@ -471,57 +453,15 @@ async def get_video(
     # Get user interaction if authenticated
     user_interaction = None
     if current_user:
-        user_id = str(current_user["_id"])
-        like = await db.interactions.find_one({
-            "user_id": user_id,
-            "video_id": video_id,
-            "interaction_type": "like"
-        })
-        dislike = await db.interactions.find_one({
-            "user_id": user_id,
-            "video_id": video_id,
-            "interaction_type": "dislike"
-        })
-        save = await db.interactions.find_one({
-            "user_id": user_id,
-            "video_id": video_id,
-            "interaction_type": "save"
-        })
-        
-        user_interaction = {
-            "liked": like is not None,
-            "disliked": dislike is not None,
-            "saved": save is not None
-        }
-    
-    video_response = VideoResponse(
-        id=str(video["_id"]),
-        uploader_id=video["uploader_id"],
-        uploader_username=video["uploader_username"],
-        uploader_profile_image_url=video.get("uploader_profile_image_url"),
-        title=video["title"],
-        description=video.get("description"),
-        tags=video.get("tags", []),
-        playlist_url=video["playlist_url"],
-        thumbnail_url=video.get("thumbnail_url"),
-        duration=video.get("duration"),
-        views=video["views"],
-        likes=video["likes"],
-        dislikes=video["dislikes"],
-        saved_count=video["saved_count"],
-        processing_status=video.get("processing_status", "completed"),
-        created_at=format_datetime_response(video["created_at"]),
-        user_interaction=user_interaction,
-        is_nsfw=video.get("is_nsfw", False),
-        last_part_id=video.get("last_part_id"),
-        next_part_id=video.get("next_part_id")
-    )
-    
-    return APIResponse(
-        status="success",
-        message="Video retrieved successfully",
-        data={"video": video_response.model_dump()}
-    )
+        await load_user_interactions(db, request, current_user, [video_id])
+        user_interaction = get_user_interaction(request, video_id)
+    
+    # Dump straight to JSON types and skip the response_model re-validation
+    return ORJSONResponse({
+        "status": "success",
+        "message": "Video retrieved successfully",
+        "data": {"video": {**video_data, "user_interaction": user_interaction}}
+    })
 
 
 @router.delete("/{video_id}", response_model=APIResponse)
@@ -530,7 +470,9 @@ async def delete_video(
     request: Request,
     response: Response,
     video_id: str,
-    current_user: dict = Depends(get_current_user)
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+    video_oid: ObjectId = Depends(valid_video_oid)
 ):
     """
     Delete video (only uploader can delete)
@@ -538,57 +480,69 @@ async def delete_video(
     """
     db = get_database()
     
-    # Validate video_id
-    if not ObjectId.is_valid(video_id):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid video ID"
-        )
+    now = datetime.now(timezone.utc)
     
-    # Get video
-    video = await db.videos.find_one({"_id": ObjectId(video_id), "is_active": True})
+    # Mark as inactive (soft delete) only if the video is active and owned by the current user
+    video = await db.videos.find_one_and_update(
+        {"_id": video_oid, "is_active": True, "uploader_id": str(current_user["_id"])},
+        {"$set": {"is_active": False, "updated_at": now}},
+        projection={"playlist_url": 1, "thumbnail_url": 1, "last_part_id": 1, "next_part_id": 1},
+        return_document=ReturnDocument.BEFORE
+    )
     if not video:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Video not found"
-        )
-    
-    # Check if current user is the uploader
-    if video["uploader_id"] != str(current_user["_id"]):
+        # Distinguish a missing video from one owned by someone else
+        existing_video = await db.videos.find_one({"_id": video_oid, "is_active": True}, {"_id": 1})
+        if not existing_video:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Video not found"
+            )
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You can only delete your own videos"
         )
+    video_cache.invalidate(video_id)
+    video_response_cache.invalidate(video_id)
     
     # Queue files for deletion in background
     from app.utils.deletion_queue import deletion_queue
-    await deletion_queue.add_to_queue('hls', video["playlist_url"])
+    pending_ops = [deletion_queue.add_to_queue('hls', video["playlist_url"])]
+    pending_steps = [f"queue HLS deletion for {video['playlist_url']}"]
     if video.get("thumbnail_url"):
-        await deletion_queue.add_to_queue('regular', video["thumbnail_url"])
-    
-    # Mark as inactive (soft delete)
-    await db.videos.update_one(
-        {"_id": ObjectId(video_id)},
-        {"$set": {"is_active": False, "updated_at": datetime.now(timezone.utc)}}
-    )
+        pending_ops.append(deletion_queue.add_to_queue('regular', video["thumbnail_url"]))
+        pending_steps.append(f"queue thumbnail deletion for {video['thumbnail_url']}")
     
-    # Delete all interactions
-    await db.interactions.delete_many({"video_id": video_id})
+    # Interaction cleanup isn't visible to the caller, so sweep it after the response is sent
+    background_tasks.add_task(sweep_video_interactions, db, video_id)
     
-    # Update part references if this video is part of a series
+    # Update part references if this video is part of a series, in a single bulk write
+    relink_ops = []
     if video.get("last_part_id"):
         # Remove this video as the next part from the previous video
-        await db.videos.update_one(
+        relink_ops.append(UpdateOne(
             {"_id": ObjectId(video["last_part_id"])},
-            {"$set": {"next_part_id": video.get("next_part_id"), "updated_at": datetime.now(timezone.utc)}}
-        )
+            {"$set": {"next_part_id": video.get("next_part_id"), "updated_at": now}}
+        ))
+        video_response_cache.invalidate(video["last_part_id"])
     
     if video.get("next_part_id"):
         # Remove this video as the last part from the next video
-        await db.videos.update_one(
+        relink_ops.append(UpdateOne(
             {"_id": ObjectId(video["next_part_id"])},
-            {"$set": {"last_part_id": video.get("last_part_id"), "updated_at": datetime.now(timezone.utc)}}
-        )
+            {"$set": {"last_part_id": video.get("last_part_id"), "updated_at": now}}
+        ))
+        video_response_cache.invalidate(video["next_part_id"])
+    
+    if relink_ops:
+        pending_ops.append(db.videos.bulk_write(relink_ops, ordered=False))
+        pending_steps.append(f"relink series parts {video.get('last_part_id')} <-> {video.get('next_part_id')}")
+    
+    # None of these writes depend on each other, so run them concurrently. The soft delete
+    # is already committed, so a failed cleanup step is logged rather than failing the request
+    results = await asyncio.gather(*pending_ops, return_exceptions=True)
+    for step, result in zip(pending_steps, results):
+        if isinstance(result, Exception):
+            print(f"Cleanup step '{step}' failed after deleting video {video_id} (uploader {current_user['_id']}): {result!r}")
     
     return APIResponse(
         status="success",
@@ -5,6 +5,21 @@ from pydantic import BaseModel, EmailStr, Field, field_validator
 from app.models import NSFWPreference
 
 
+# Validator patterns, compiled once at import
+HTML_TAG_RE = re.compile(r'<[^>]*>')
+NAME_DISALLOWED_CHARS_RE = re.compile(r'[^\w\s\-\'\.]')
+TAG_DISALLOWED_CHARS_RE = re.compile(r'[^\w\s\-]')
+
+
+def sanitize_tag(tag: str) -> str:
+    """Strip a tag down to word characters, whitespace and hyphens"""
+    # Most tags are already clean (letters/digits with spaces, hyphens or underscores);
+    # that check runs in C via str methods, so the regex only runs on the rest
+    if tag.replace(' ', '').replace('-', '').replace('_', '').isalnum():
+        return tag.strip()
+    return TAG_DISALLOWED_CHARS_RE.sub('', tag).strip()
+
+
 # Response Models
 class DateTimeResponse(BaseModel):
     """Schema for datetime responses with timezone information"""
@@ -20,16 +35,9 @@ class APIResponse(BaseModel):
 
 # User Schemas
 class UserRegister(BaseModel):
+    # Only letters, numbers, and underscores; the pattern is enforced by pydantic-core
     username: str = Field(..., min_length=3, max_length=50, pattern=r'^[a-zA-Z0-9_]+$')
     password: str = Field(..., min_length=6)
-    
-    @field_validator('username')
-    @classmethod
-    def validate_username(cls, v):
-        # Only allow letters, numbers, and underscores
-        if not re.match(r'^[a-zA-Z0-9_]+$', v):
-            raise ValueError('Username can only contain letters, numbers, and underscores')
-        return v
 
 
 class UserLogin(BaseModel):
@@ -48,6 +56,10 @@ class UserProfile(BaseModel):
     show_nsfw: NSFWPreference = NSFWPreference.ASK
 
 
+# MongoDB projection limited to the stored fields a UserProfile is built from (never the password hash)
+USER_PROFILE_PROJECTION = {field: 1 for field in UserProfile.model_fields if field != "id"}
+
+
 class UserProfileUpdate(BaseModel):
     email: Optional[str] = None
     full_name: Optional[str] = Field(None, max_length=100)
@@ -60,7 +72,7 @@ class UserProfileUpdate(BaseModel):
         if v is None:
             return v
         # Remove any potentially harmful characters
-        return re.sub(r'[^\w\s\-\'\.]', '', v).strip()
+        return NAME_DISALLOWED_CHARS_RE.sub('', v).strip()
     
     @field_validator('bio')
     @classmethod
@@ -68,7 +80,7 @@ class UserProfileUpdate(BaseModel):
         if v is None:
             return v
         # Basic sanitization - allow common punctuation but remove potential script tags
-        return re.sub(r'<[^>]*>', '', v)
+        return HTML_TAG_RE.sub('', v)
 
 
 class Token(BaseModel):
@@ -80,10 +92,15 @@ class TokenData(BaseModel):
     user_id: Optional[str] = None
 
 
+class AuthUser(BaseModel):
+    id: str
+    username: str
+
+
 class AuthResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
-    user: dict  # Contains id, username, etc.
+    user: AuthUser
 
 
 # Video Schemas
@@ -98,14 +115,14 @@ class VideoUpload(BaseModel):
     def sanitize_title(cls, v):
         if v is None:
             return v
-        return re.sub(r'<[^>]*>', '', v).strip()
+        return HTML_TAG_RE.sub('', v).strip()
     
     @field_validator('description')
     @classmethod
     def sanitize_description(cls, v):
         if v is None:
             return v
-        return re.sub(r'<[^>]*>', '', v)
+        return HTML_TAG_RE.sub('', v)
     
     @field_validator('tags')
     @classmethod
@@ -115,10 +132,17 @@ class VideoUpload(BaseModel):
         # Sanitize each tag - only allow alphanumeric and some punctuation
         sanitized = []
         for tag in v:
-            clean_tag = re.sub(r'[^\w\s\-]', '', tag).strip()
+            clean_tag = sanitize_tag(tag)
             if clean_tag:  # Only add non-empty tags
                 sanitized.append(clean_tag)
-        return sanitized
+        # Drop repeated tags, keeping the first occurrence's position
+        return list(dict.fromkeys(sanitized))
+
+
+class UserInteraction(BaseModel):
+    liked: bool = False
+    disliked: bool = False
+    saved: bool = False
 
 
 class VideoResponse(BaseModel):
@@ -138,7 +162,7 @@ class VideoResponse(BaseModel):
     saved_count: int = 0
     processing_status: str = "completed"  # pending, processing, completed, failed
     created_at: DateTimeResponse
-    user_interaction: Optional[dict] = None  # {"liked": bool, "disliked": bool, "saved": bool}
+    user_interaction: Optional[UserInteraction] = None  # Only set for authenticated requests
     is_nsfw: bool = False
     last_part_id: Optional[str] = None  # Reference to previous video in series
     next_part_id: Optional[str] = None  # Reference to next video in series
@@ -151,6 +175,12 @@ class VideoList(BaseModel):
     page_size: int
 
 
+# MongoDB projection limited to the stored fields a VideoResponse is built from
+VIDEO_RESPONSE_PROJECTION = {
+    field: 1 for field in VideoResponse.model_fields if field not in ("id", "user_interaction")
+}
+
+
 # Interaction Schemas
 class InteractionResponse(BaseModel):
     success: bool
@@ -0,0 +1,87 @@
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class TTLCache:
+    """In-process LRU cache with a per-entry time-to-live"""
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 30.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+        # Generation of each key with a load in flight; invalidate() bumps it so that load isn't cached.
+        # Values come from one counter, so a later load never reuses an invalidated generation
+        self._generations: Dict[Hashable, int] = {}
+        self._generation_counter = itertools.count()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry when full"""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Drop a cached value, and keep an in-flight load from caching what it read before the change"""
+        self._data.pop(key, None)
+        if key in self._generations:
+            self._generations[key] = next(self._generation_counter)
+            # Later misses start a fresh load instead of sharing the stale one
+            self._loading.pop(key, None)
+
+    async def get_or_load(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Optional[Any]:
+        """
+        Return the cached value, or run loader() to produce and cache it.
+        Concurrent misses for the same key share a single loader call, so an expired
+        hot key causes one database query instead of a burst. None results aren't cached.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        task = self._loading.get(key)
+        if task is None:
+            generation = next(self._generation_counter)
+            self._generations[key] = generation
+            task = asyncio.ensure_future(loader())
+            self._loading[key] = task
+            task.add_done_callback(lambda done: self._finish_load(key, done, generation))
+
+        # Shield so one cancelled request doesn't cancel the load for the others waiting on it
+        return await asyncio.shield(task)
+
+    def _finish_load(self, key: Hashable, task: asyncio.Future, generation: int):
+        """Cache a completed load unless the key was invalidated meanwhile, and clear its in-flight entry"""
+        if self._generations.get(key) != generation:
+            return
+
+        del self._generations[key]
+        self._loading.pop(key, None)
+        if not task.cancelled() and task.exception() is None and task.result() is not None:
+            self.set(key, task.result())
+
+
+# Global cache instances (per worker process)
+profile_cache = TTLCache(maxsize=10000, ttl=30)  # username -> public profile dict
+video_cache = TTLCache(maxsize=10000, ttl=30)  # video_id -> active video {_id, views}
+video_response_cache = TTLCache(maxsize=10000, ttl=30)  # video_id -> VideoResponse dict without user_interaction
+token_cache = TTLCache(maxsize=10000, ttl=30)  # sha256(access token) -> (user_id, exp)
+user_cache = TTLCache(maxsize=10000, ttl=30)  # user_id -> user document (without interaction arrays)
@@ -0,0 +1,116 @@
+from typing import Dict, Any, List, Optional
+from bson import ObjectId
+from fastapi import Request
+
+
+# Interaction type -> embedded array on the user document
+INTERACTION_FIELDS = {
+    "like": "liked_videos",
+    "dislike": "disliked_videos",
+    "save": "saved_videos"
+}
+
+# Projection for loading a user without their interaction arrays: $slice 0 sends each array
+# back empty, which still shows whether it exists (for the backfill) but not its contents
+USER_WITHOUT_INTERACTIONS_PROJECTION = {field: {"$slice": 0} for field in INTERACTION_FIELDS.values()}
+
+
+def has_embedded_interactions(user: Dict[str, Any]) -> bool:
+    """Check whether the user document carries the embedded interaction arrays"""
+    return all(field in user for field in INTERACTION_FIELDS.values())
+
+
+async def ensure_embedded_interactions(db, user: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Backfill the embedded interaction arrays for users created before they existed, then drop
+    the arrays from the (USER_WITHOUT_INTERACTIONS_PROJECTION) document so they are never cached.
+    The interactions collection stays the source of truth for ordering/history;
+    the arrays answer "did this user like/dislike/save this video?" in a single query.
+    """
+    if not has_embedded_interactions(user):
+        embedded = {field: [] for field in INTERACTION_FIELDS.values()}
+        cursor = db.interactions.find(
+            {"user_id": str(user["_id"]), "interaction_type": {"$in": list(INTERACTION_FIELDS)}},
+            {"_id": 0, "video_id": 1, "interaction_type": 1}
+        )
+        async for interaction in cursor:
+            field = INTERACTION_FIELDS.get(interaction["interaction_type"])
+            if field:
+                embedded[field].append(interaction["video_id"])
+
+        # Only sets arrays that still don't exist, so a concurrent backfill or a toggle that ran
+        # after this one can't be overwritten or have an unliked video re-added
+        await db.users.update_one(
+            {"_id": user["_id"], "liked_videos": {"$exists": False}},
+            {"$set": embedded}
+        )
+
+    for field in INTERACTION_FIELDS.values():
+        user.pop(field, None)
+    return user
+
+
+async def sweep_video_interactions(db, video_id: str, batch_size: int = 10000):
+    """
+    Delete a removed video's interactions in bounded batches, so a popular video
+    doesn't turn into one long-running delete_many. Reads already skip inactive videos.
+    Each batch's users get the video pulled from their embedded arrays first, looked up
+    by _id since the arrays aren't indexed.
+    """
+    while True:
+        cursor = db.interactions.find(
+            {"video_id": video_id},
+            {"_id": 1, "user_id": 1, "interaction_type": 1}
+        ).limit(batch_size)
+        batch = await cursor.to_list(length=batch_size)
+        if not batch:
+            break
+
+        user_oids_by_field = {field: [] for field in INTERACTION_FIELDS.values()}
+        for interaction in batch:
+            field = INTERACTION_FIELDS.get(interaction["interaction_type"])
+            if field and ObjectId.is_valid(interaction["user_id"]):
+                user_oids_by_field[field].append(ObjectId(interaction["user_id"]))
+
+        for field, user_oids in user_oids_by_field.items():
+            if user_oids:
+                await db.users.update_many(
+                    {"_id": {"$in": user_oids}, field: video_id},
+                    {"$pull": {field: video_id}}
+                )
+
+        await db.interactions.delete_many({"_id": {"$in": [interaction["_id"] for interaction in batch]}})
+        if len(batch) < batch_size:
+            break
+
+
+async def load_user_interactions(db, request: Request, user: Optional[Dict[str, Any]], video_ids: List[str]):
+    """
+    Fetch the user's like/dislike/save state for just these videos onto request.state, for
+    get_user_interaction. Only the matching IDs leave the database, however long the arrays are.
+    """
+    interactions = {interaction_type: set() for interaction_type in INTERACTION_FIELDS}
+    if user and video_ids:
+        result = await db.users.aggregate([
+            {"$match": {"_id": user["_id"]}},
+            {"$project": {
+                interaction_type: {"$setIntersection": [{"$ifNull": [f"${field}", []]}, video_ids]}
+                for interaction_type, field in INTERACTION_FIELDS.items()
+            }}
+        ]).to_list(length=1)
+        if result:
+            interactions = {interaction_type: set(result[0][interaction_type]) for interaction_type in INTERACTION_FIELDS}
+    request.state.user_interactions = interactions
+
+
+def get_user_interaction(request: Request, video_id: str) -> Dict[str, bool]:
+    """
+    Get the like/dislike/save state of a video for the authenticated user.
+    Served from the state load_user_interactions put on request.state for the current page.
+    """
+    interactions = request.state.user_interactions
+    return {
+        "liked": video_id in interactions["like"],
+        "disliked": video_id in interactions["dislike"],
+        "saved": video_id in interactions["save"]
+    }
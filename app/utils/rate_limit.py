@@ -1,6 +1,7 @@
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from fastapi import Request
+from app.config import settings
 
 
 def get_client_ip(request: Request) -> str:
@@ -11,7 +12,9 @@ def get_client_ip(request: Request) -> str:
     forwarded_for = request.headers.get("X-Forwarded-For")
     if forwarded_for:
         # X-Forwarded-For can contain multiple IPs, get the first one (client IP)
-        return forwarded_for.split(",")[0].strip()
+        # without splitting the whole header into a list
+        comma = forwarded_for.find(",")
+        return (forwarded_for[:comma] if comma >= 0 else forwarded_for).strip()
     
     real_ip = request.headers.get("X-Real-IP")
     if real_ip:
@@ -25,7 +28,7 @@ def get_client_ip(request: Request) -> str:
 limiter = Limiter(
     key_func=get_client_ip,
     default_limits=["200 per minute"],  # Default limit for all endpoints
-    storage_uri="memory://",  # Use in-memory storage
+    storage_uri=settings.RATE_LIMIT_STORAGE_URI,  # In-memory by default, Redis when configured
     headers_enabled=False  # Disable headers to not expose rate limit info
 )
 
@@ -1,13 +1,34 @@
 import boto3
 from botocore.client import Config
 from botocore.exceptions import ClientError
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
 from typing import Optional, Dict, Any, Callable
+import re
 import uuid
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from functools import partial
+from urllib.parse import urlsplit
 from app.config import settings
 
 
+# Anything outside this set (path separators included) is replaced in object keys
+UNSAFE_KEY_CHARS_RE = re.compile(r'[^A-Za-z0-9._-]')
+
+# Every object key is unique (uuid prefix or per-video HLS path) and never rewritten,
+# so the CDN and browsers can cache them indefinitely
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Uploads of 16MB or more go out as 16MB multipart chunks, a few in parallel, so memory stays
+# bounded; anything smaller (segments, thumbnails) is sent as a single PUT
+MULTIPART_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=16 * 1024 * 1024,
+    multipart_chunksize=16 * 1024 * 1024,
+    max_concurrency=4
+)
+
+
 class R2Storage:
     def __init__(self):
         self.s3_client = boto3.client(
@@ -15,20 +36,38 @@ class R2Storage:
             endpoint_url=settings.R2_ENDPOINT_URL,
             aws_access_key_id=settings.R2_ACCESS_KEY_ID,
             aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
-            config=Config(signature_version='s3v4'),
+            config=Config(
+                signature_version='s3v4',
+                # Keep enough pooled connections for concurrent requests plus multipart part uploads,
+                # so they reuse TLS sessions instead of opening new ones
+                max_pool_connections=64,
+                retries={'max_attempts': 3, 'mode': 'adaptive'}
+            ),
             region_name='auto'
         )
         self.bucket_name = settings.R2_BUCKET_NAME
         self.public_url = settings.R2_PUBLIC_URL
+        self._public_prefix = self.public_url.rstrip('/') + '/'
         
         # Create a semaphore to limit concurrent S3 operations
-        self.s3_semaphore = asyncio.Semaphore(getattr(settings, 'MAX_CONCURRENT_S3_OPS', 10))
+        max_s3_ops = getattr(settings, 'MAX_CONCURRENT_S3_OPS', 10)
+        self.s3_semaphore = asyncio.Semaphore(max_s3_ops)
+        
+        # Dedicated threads for S3 calls so they don't compete with other work on the default executor
+        self._executor = ThreadPoolExecutor(max_workers=max_s3_ops, thread_name_prefix='r2')
 
     async def _run_in_executor(self, func: Callable, *args, **kwargs) -> Any:
-        """Run a blocking function in a thread pool executor with semaphore to limit concurrency"""
+        """Run a blocking function in the S3 thread pool with semaphore to limit concurrency"""
         async with self.s3_semaphore:
             loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, partial(func, *args, **kwargs))
+            return await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+    
+    def _key_from_url(self, file_url: str) -> str:
+        """Turn a public URL back into its object key (everything after the public URL prefix)"""
+        if file_url.startswith(self._public_prefix):
+            return file_url[len(self._public_prefix):]
+        # URLs minted under a different public domain: fall back to the URL path
+        return urlsplit(file_url).path.lstrip('/')
     
     async def upload_file(self, file_data: bytes, filename: str, content_type: str) -> str:
         """
@@ -36,7 +75,7 @@ class R2Storage:
         """
         try:
             # Generate unique filename
-            unique_filename = f"{uuid.uuid4()}_{filename}"
+            unique_filename = f"{uuid.uuid4().hex}_{UNSAFE_KEY_CHARS_RE.sub('_', filename)}"
             
             # Upload to R2 in a thread pool to avoid blocking the event loop
             await self._run_in_executor(
@@ -44,7 +83,8 @@ class R2Storage:
                 Bucket=self.bucket_name,
                 Key=unique_filename,
                 Body=file_data,
-                ContentType=content_type
+                ContentType=content_type,
+                CacheControl=IMMUTABLE_CACHE_CONTROL
             )
             
             # Return public URL
@@ -62,44 +102,50 @@ class R2Storage:
         try:
             base_path = f"hls/{video_id}"
             
-            # Upload master playlist
-            master_key = f"{base_path}/master.m3u8"
-            await self._run_in_executor(
-                self.s3_client.put_object,
-                Bucket=self.bucket_name,
-                Key=master_key,
-                Body=hls_data['master_playlist'].encode('utf-8'),
-                ContentType='application/vnd.apple.mpegurl'
-            )
-            
-            # Upload each quality variant
+            # Upload every variant playlist and segment concurrently;
+            # s3_semaphore in _run_in_executor caps how many are in flight
+            uploads = []
             for quality, data in hls_data['playlists'].items():
-                # Upload playlist
                 playlist_key = f"{base_path}/{quality}/playlist.m3u8"
-                await self._run_in_executor(
+                uploads.append(self._run_in_executor(
                     self.s3_client.put_object,
                     Bucket=self.bucket_name,
                     Key=playlist_key,
                     Body=data['playlist'].encode('utf-8'),
-                    ContentType='application/vnd.apple.mpegurl'
-                )
+                    ContentType='application/vnd.apple.mpegurl',
+                    CacheControl=IMMUTABLE_CACHE_CONTROL
+                ))
                 
-                # Upload segments
+                # Segments are streamed from their files on disk rather than held in memory
                 for segment in data['segments']:
                     segment_key = f"{base_path}/{quality}/{segment['filename']}"
-                    await self._run_in_executor(
-                        self.s3_client.put_object,
-                        Bucket=self.bucket_name,
-                        Key=segment_key,
-                        Body=segment['data'],
-                        ContentType='video/MP2T'
-                    )
+                    uploads.append(self._run_in_executor(
+                        self.s3_client.upload_file,
+                        segment['path'],
+                        self.bucket_name,
+                        segment_key,
+                        ExtraArgs={'ContentType': segment['content_type'], 'CacheControl': IMMUTABLE_CACHE_CONTROL},
+                        Config=MULTIPART_TRANSFER_CONFIG
+                    ))
+            
+            await asyncio.gather(*uploads)
+            
+            # Upload the master playlist last, once everything it points to exists
+            master_key = f"{base_path}/master.m3u8"
+            await self._run_in_executor(
+                self.s3_client.put_object,
+                Bucket=self.bucket_name,
+                Key=master_key,
+                Body=hls_data['master_playlist'].encode('utf-8'),
+                ContentType='application/vnd.apple.mpegurl',
+                CacheControl=IMMUTABLE_CACHE_CONTROL
+            )
             
             # Return master playlist URL
             master_url = f"{self.public_url}/{master_key}"
             return master_url
             
-        except ClientError as e:
+        except (ClientError, S3UploadFailedError) as e:
             raise Exception(f"Failed to upload HLS content to R2: {e}")
 
     async def delete_file(self, file_url: str) -> bool:
@@ -107,8 +153,8 @@ class R2Storage:
         Delete file from R2 given its public URL
         """
         try:
-            # Extract filename from URL
-            filename = file_url.split('/')[-1]
+            # Extract the object key from the URL
+            filename = self._key_from_url(file_url)
             
             # Delete from R2
             await self._run_in_executor(
@@ -128,28 +174,31 @@ class R2Storage:
         try:
             # Extract video_id from URL
             # Format: https://domain.com/hls/VIDEO_ID/master.m3u8
-            parts = playlist_url.split('/')
-            if 'hls' in parts:
-                hls_index = parts.index('hls')
-                if len(parts) > hls_index + 1:
-                    video_id = parts[hls_index + 1]
-                    base_path = f"hls/{video_id}/"
-                    
-                    # List all objects with this prefix
-                    response = await self._run_in_executor(
-                        self.s3_client.list_objects_v2,
-                        Bucket=self.bucket_name,
-                        Prefix=base_path
-                    )
+            key_parts = self._key_from_url(playlist_url).split('/', 2)
+            if key_parts[0] == 'hls' and len(key_parts) > 1 and key_parts[1]:
+                base_path = f"hls/{key_parts[1]}/"
+                
+                # List the objects page by page (up to 1000 keys each) and remove
+                # each page with a single batch delete instead of one request per key
+                list_kwargs = {'Bucket': self.bucket_name, 'Prefix': base_path}
+                while True:
+                    response = await self._run_in_executor(self.s3_client.list_objects_v2, **list_kwargs)
                     
-                    # Delete all objects
                     if 'Contents' in response:
-                        for obj in response['Contents']:
-                            await self._run_in_executor(
-                                self.s3_client.delete_object,
-                                Bucket=self.bucket_name,
-                                Key=obj['Key']
-                            )
+                        result = await self._run_in_executor(
+                            self.s3_client.delete_objects,
+                            Bucket=self.bucket_name,
+                            Delete={
+                                'Objects': [{'Key': obj['Key']} for obj in response['Contents']],
+                                'Quiet': True
+                            }
+                        )
+                        if result.get('Errors'):
+                            print(f"R2 batch delete errors for {base_path}: {result['Errors']}")
+                    
+                    if not response.get('IsTruncated'):
+                        break
+                    list_kwargs['ContinuationToken'] = response['NextContinuationToken']
             return True
         except ClientError as e:
             return False
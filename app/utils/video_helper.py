@@ -0,0 +1,59 @@
+from fastapi import HTTPException, status
+from typing import Optional
+from bson import ObjectId
+from bson.errors import InvalidId
+from app.utils.cache import video_cache
+from app.utils.datetime_helper import format_datetime_response
+
+
+async def get_active_video(db, video_id: str, video_oid: ObjectId):
+    """
+    Get an active video (_id and views only), served from the in-process cache when possible.
+    Callers only need existence and the stored view count, so nothing else is fetched.
+    """
+    video = video_cache.get(video_id)
+    if video is None:
+        video = await db.videos.find_one({"_id": video_oid, "is_active": True}, {"views": 1})
+        if video:
+            video_cache.set(video_id, video)
+    return video
+
+
+async def valid_video_oid(video_id: str) -> ObjectId:
+    """FastAPI dependency that parses the video_id path parameter once, or rejects it with 400"""
+    try:
+        return ObjectId(video_id)
+    except (InvalidId, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid video ID"
+        )
+
+
+def video_doc_to_response_dict(video: dict, video_id: Optional[str] = None, user_interaction: Optional[dict] = None) -> dict:
+    """
+    Build the VideoResponse-shaped dict for a video document without going through Pydantic.
+    Pass video_id when the caller already has str(video["_id"]) to avoid converting it twice.
+    """
+    return {
+        "id": video_id or str(video["_id"]),
+        "uploader_id": video["uploader_id"],
+        "uploader_username": video["uploader_username"],
+        "uploader_profile_image_url": video.get("uploader_profile_image_url"),
+        "title": video["title"],
+        "description": video.get("description"),
+        "tags": video.get("tags", []),
+        "playlist_url": video["playlist_url"],
+        "thumbnail_url": video.get("thumbnail_url"),
+        "duration": video.get("duration"),
+        "views": video["views"],
+        "likes": video["likes"],
+        "dislikes": video["dislikes"],
+        "saved_count": video["saved_count"],
+        "processing_status": video.get("processing_status", "completed"),
+        "created_at": format_datetime_response(video["created_at"]),
+        "user_interaction": user_interaction,
+        "is_nsfw": video.get("is_nsfw", False),
+        "last_part_id": video.get("last_part_id"),
+        "next_part_id": video.get("next_part_id")
+    }
@@ -1,3 +1,5 @@
+import asyncio
+import json
 import subprocess
 import tempfile
 import os
@@ -7,40 +9,104 @@ from pathlib import Path
 from app.config import settings
 
 
+# Segment files FFmpeg can write into a rendition directory, with the content type R2 serves them as
+HLS_MEDIA_CONTENT_TYPES = {
+    '.ts': 'video/MP2T',
+    '.m4s': 'video/iso.segment',
+    '.mp4': 'video/mp4'
+}
+
+# Fixed 48-frame GOP so every rendition has keyframes at the same points and
+# segments can be cut (and players can switch quality) on the same boundaries
+HLS_GOP_ARGS = ['-g', '48', '-keyint_min', '48']
+
+# FFmpeg's stderr is captured in memory and never inspected, so skip the banner and the
+# per-frame progress lines it would otherwise write for the whole encode
+FFMPEG_QUIET_ARGS = ['-hide_banner', '-loglevel', 'error', '-nostats']
+
+# Write HLS output to a RAM-backed directory when one is available
+HLS_TMP_DIR = getattr(settings, 'HLS_TMP_DIR', None)
+if HLS_TMP_DIR:
+    try:
+        os.makedirs(HLS_TMP_DIR, exist_ok=True)
+    except OSError as e:
+        print(f"HLS temp dir {HLS_TMP_DIR} unavailable, using system temp dir: {e}")
+        HLS_TMP_DIR = None
+
+
+def hls_temp_parent(video_path: str) -> Optional[str]:
+    """
+    Pick the parent directory for a video's HLS output: HLS_TMP_DIR when it has room for
+    twice the source size (all renditions together stay below that), else the system temp dir
+    """
+    if not HLS_TMP_DIR:
+        return None
+    try:
+        if shutil.disk_usage(HLS_TMP_DIR).free >= 2 * os.path.getsize(video_path):
+            return HLS_TMP_DIR
+    except OSError:
+        pass
+    return None
+
+
 class VideoProcessor:
-    # Quality presets are now loaded from config settings
+    # H.264 encoder picked on first use (see get_video_encoder)
+    _video_encoder: Optional[str] = None
+    
     @staticmethod
-    def get_qualities():
-        return {
-            '1080p': {
-                'width': 1920, 
-                'height': 1080, 
-                'bitrate': getattr(settings, 'VIDEO_BITRATE_1080P', '3500k'), 
-                'audio_bitrate': '128k', 
-                'crf': settings.VIDEO_CRF_1080P
-            },
-            '720p': {
-                'width': 1280, 
-                'height': 720, 
-                'bitrate': getattr(settings, 'VIDEO_BITRATE_720P', '1800k'), 
-                'audio_bitrate': '96k', 
-                'crf': getattr(settings, 'VIDEO_CRF_720P', 24)
-            },
-            '480p': {
-                'width': 854, 
-                'height': 480, 
-                'bitrate': getattr(settings, 'VIDEO_BITRATE_480P', '900k'), 
-                'audio_bitrate': '96k', 
-                'crf': getattr(settings, 'VIDEO_CRF_480P', 25)
-            },
-            '360p': {
-                'width': 640, 
-                'height': 360, 
-                'bitrate': getattr(settings, 'VIDEO_BITRATE_360P', '500k'), 
-                'audio_bitrate': '64k', 
-                'crf': getattr(settings, 'VIDEO_CRF_360P', 26)
-            },
-        }
+    async def run_command(cmd: List[str], timeout: float) -> subprocess.CompletedProcess:
+        """
+        Run an FFmpeg/FFprobe command as an asyncio subprocess so the event loop keeps
+        serving requests while it runs. Kills the process and raises on timeout.
+        """
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.communicate()
+            raise
+        return subprocess.CompletedProcess(cmd, proc.returncode, stdout, stderr)
+    
+    # Quality presets, loaded from config settings once at import (treat as read-only)
+    _QUALITIES: Dict[str, Dict] = {
+        '1080p': {
+            'width': 1920, 
+            'height': 1080, 
+            'bitrate': getattr(settings, 'VIDEO_BITRATE_1080P', '3500k'), 
+            'audio_bitrate': '128k', 
+            'crf': settings.VIDEO_CRF_1080P
+        },
+        '720p': {
+            'width': 1280, 
+            'height': 720, 
+            'bitrate': getattr(settings, 'VIDEO_BITRATE_720P', '1800k'), 
+            'audio_bitrate': '96k', 
+            'crf': getattr(settings, 'VIDEO_CRF_720P', 24)
+        },
+        '480p': {
+            'width': 854, 
+            'height': 480, 
+            'bitrate': getattr(settings, 'VIDEO_BITRATE_480P', '900k'), 
+            'audio_bitrate': '96k', 
+            'crf': getattr(settings, 'VIDEO_CRF_480P', 25)
+        },
+        '360p': {
+            'width': 640, 
+            'height': 360, 
+            'bitrate': getattr(settings, 'VIDEO_BITRATE_360P', '500k'), 
+            'audio_bitrate': '64k', 
+            'crf': getattr(settings, 'VIDEO_CRF_360P', 26)
+        },
+    }
+    
+    @classmethod
+    def get_qualities(cls) -> Dict[str, Dict]:
+        return cls._QUALITIES
     
     @staticmethod
     async def process_video_to_hls(video_path: str) -> Tuple[Optional[float], Optional[bytes], Optional[Dict]]:
@@ -50,52 +116,185 @@ class VideoProcessor:
         hls_data = {
             'master_playlist': 'master.m3u8 content',
             'playlists': {
-                '1080p': {'playlist': 'content', 'segments': [bytes]},
+                '1080p': {'playlist': 'content', 'segments': [{'filename': name, 'path': local path, 'content_type': mime}]},
                 '720p': {...},
-            }
+            },
+            'temp_dir': directory holding the segments, removed by the caller after upload
         }
         """
         try:
-            duration = await VideoProcessor.get_video_duration(video_path)
-            thumbnail_bytes = await VideoProcessor.generate_thumbnail(video_path)
-            hls_data = await VideoProcessor.create_hls_streams(video_path)
+            async def probe_and_encode():
+                # One ffprobe pass gives both the duration and the source height
+                duration, video_height = await VideoProcessor.probe_video(video_path)
+                hls_data = await VideoProcessor.create_hls_streams(video_path, video_height)
+                return duration, hls_data
+            
+            # The thumbnail doesn't depend on the probe or the encode, so it runs alongside them
+            (duration, hls_data), thumbnail_bytes = await asyncio.gather(
+                probe_and_encode(),
+                VideoProcessor.generate_thumbnail(video_path)
+            )
             return duration, thumbnail_bytes, hls_data
         except Exception as e:
             print(f"HLS processing error: {e}")
             return None, None, None
 
     @staticmethod
-    async def create_hls_streams(video_path: str) -> Optional[Dict]:
+    async def get_video_encoder() -> str:
+        """
+        Pick the H.264 encoder once per process: a hardware encoder when VIDEO_HW_ENCODER
+        asks for one and this FFmpeg build has it, otherwise libx264
+        """
+        if VideoProcessor._video_encoder is None:
+            preference = getattr(settings, 'VIDEO_HW_ENCODER', 'none')
+            encoder = 'libx264'
+            if preference != 'none':
+                candidates = ['h264_nvenc', 'h264_vaapi'] if preference == 'auto' else [f'h264_{preference}']
+                try:
+                    result = await VideoProcessor.run_command(['/usr/bin/ffmpeg', '-hide_banner', '-encoders'], timeout=30)
+                    available = result.stdout.decode()
+                except Exception:
+                    available = ''
+                for candidate in candidates:
+                    if f' {candidate} ' in available:
+                        encoder = candidate
+                        break
+            print(f"Using {encoder} for HLS encoding")
+            VideoProcessor._video_encoder = encoder
+        return VideoProcessor._video_encoder
+
+    @staticmethod
+    def build_hls_command(video_path: str, temp_dir: str, qualities: Dict[str, Dict], encoder: str = 'libx264') -> List[str]:
+        """
+        Build a single FFmpeg command that decodes the source once, splits the decoded
+        frames, and writes one scaled HLS rendition per quality into temp_dir/<quality>/
+        """
+        count = len(qualities)
+        
+        # VAAPI encodes from GPU surfaces, so each scaled frame is uploaded after the CPU scale
+        upload_filter = ',format=nv12,hwupload' if encoder == 'h264_vaapi' else ''
+        filter_parts = [f"[0:v]split={count}" + ''.join(f"[s{i}]" for i in range(count))]
+        for i, quality_settings in enumerate(qualities.values()):
+            filter_parts.append(
+                f"[s{i}]scale={quality_settings['width']}:{quality_settings['height']}"
+                f":force_original_aspect_ratio=decrease{upload_filter}[v{i}]"
+            )
+        
+        # Share the job's thread budget between the encoders running side by side. With
+        # FFMPEG_THREADS at 0 (the default) each of the MAX_CONCURRENT_UPLOADS processing jobs
+        # gets an equal share of the cores, so one job uses the whole machine and concurrent
+        # jobs don't each spawn a thread per core per rendition
+        thread_count = getattr(settings, 'FFMPEG_THREADS', 0)
+        if thread_count == 0:
+            thread_count = max(1, (os.cpu_count() or 1) // max(1, getattr(settings, 'MAX_CONCURRENT_UPLOADS', 1)))
+        thread_param = ['-threads', str(max(1, thread_count // count))]
+        # The split/scale graph otherwise gets its own thread per core on top of the encoders
+        filter_thread_param = [
+            '-filter_threads', str(min(2, thread_count)),
+            '-filter_complex_threads', str(min(2, thread_count))
+        ]
+        
+        single_file = getattr(settings, 'HLS_SINGLE_FILE', False)
+        
+        cmd = ['/usr/bin/ffmpeg'] + FFMPEG_QUIET_ARGS
+        if encoder == 'h264_vaapi':
+            cmd += ['-vaapi_device', getattr(settings, 'VAAPI_DEVICE', '/dev/dri/renderD128')]
+        cmd += filter_thread_param + [
+            '-i', video_path,
+            '-filter_complex', ';'.join(filter_parts)
+        ]
+        for i, (quality, quality_settings) in enumerate(qualities.items()):
+            quality_dir = os.path.join(temp_dir, quality)
+            bitrate_k = float(quality_settings['bitrate'].replace('k', ''))
+            
+            # Either one fMP4 file per rendition addressed by byte ranges (a couple of uploads per
+            # quality instead of one per 6s segment), or the classic numbered .ts segments
+            if single_file:
+                segment_args = [
+                    '-hls_segment_type', 'fmp4',
+                    '-hls_flags', 'single_file',
+                    '-hls_fmp4_init_filename', 'init.mp4',
+                    '-hls_segment_filename', os.path.join(quality_dir, 'data.m4s')
+                ]
+            else:
+                segment_args = ['-hls_segment_filename', os.path.join(quality_dir, 'segment_%03d.ts')]
+            
+            vbv = [
+                '-maxrate', f"{int(bitrate_k * 1.5)}k",
+                '-bufsize', f"{int(bitrate_k * 2)}k",
+            ]
+            if encoder == 'h264_nvenc':
+                video_codec = ['-c:v', 'h264_nvenc', '-preset', 'p4', '-tune', 'hq', '-rc', 'vbr', '-cq', str(quality_settings['crf']),
+                               '-b:v', quality_settings['bitrate']] + vbv + HLS_GOP_ARGS + ['-no-scenecut', '1']
+            elif encoder == 'h264_vaapi':
+                video_codec = ['-c:v', 'h264_vaapi', '-b:v', quality_settings['bitrate']] + vbv + HLS_GOP_ARGS
+            else:
+                # Capped CRF: libx264 ignores -b:v once -crf is set, so only the VBV cap is passed
+                video_codec = thread_param + ['-c:v', 'libx264', '-crf', str(quality_settings['crf'])] + vbv + [
+                    '-preset', getattr(settings, 'VIDEO_COMPRESSION_PRESET', 'medium'),
+                ] + HLS_GOP_ARGS + ['-sc_threshold', '0']
+            cmd += [
+                '-map', f'[v{i}]',
+                '-map', '0:a?',  # Audio is optional; silent sources still encode
+            ] + video_codec + [
+                '-c:a', 'aac',
+                '-b:a', quality_settings['audio_bitrate'],
+                '-ac', '2',  # Stereo audio
+                '-ar', '44100',  # Audio sample rate
+                '-hls_time', '6',
+                '-hls_playlist_type', 'vod',
+            ] + segment_args + [
+                '-f', 'hls',
+                os.path.join(quality_dir, 'playlist.m3u8')
+            ]
+        return cmd
+
+    @staticmethod
+    async def create_hls_streams(video_path: str, video_height: Optional[int] = None) -> Optional[Dict]:
         """
         Create HLS streams with multiple qualities
         """
         try:
             # Create temp directory for HLS output
-            temp_dir = tempfile.mkdtemp(prefix='hls_')
+            temp_dir = tempfile.mkdtemp(prefix='hls_', dir=hls_temp_parent(video_path))
             
             hls_data = {
                 'master_playlist': '',
-                'playlists': {}
+                'playlists': {},
+                'temp_dir': temp_dir
             }
             
-            # Get video resolution to determine available qualities
-            video_height = await VideoProcessor.get_video_height(video_path)
+            # Get video resolution to determine available qualities (unless the caller already probed it)
+            if video_height is None:
+                video_height = await VideoProcessor.get_video_height(video_path)
             
             # Get qualities from config
             qualities = VideoProcessor.get_qualities()
             
             # Filter qualities based on source resolution
             available_qualities = {}
-            for quality, settings in qualities.items():
-                if video_height and video_height >= settings['height']:
-                    available_qualities[quality] = settings
+            for quality, quality_settings in qualities.items():
+                if video_height and video_height >= quality_settings['height']:
+                    available_qualities[quality] = quality_settings
             
             # If no qualities available, use original resolution
             if not available_qualities:
                 available_qualities = {'360p': qualities['360p']}
             
-            # Generate HLS for each quality
-            master_playlist_lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+            # Check if we should use two-pass encoding
+            use_two_pass = getattr(settings, 'USE_TWO_PASS_ENCODING', False)
+            
+            # Generate HLS for each quality (fMP4 renditions need playlist version 7)
+            single_file = getattr(settings, 'HLS_SINGLE_FILE', False) and not use_two_pass
+            master_playlist_lines = ['#EXTM3U', '#EXT-X-VERSION:7' if single_file else '#EXT-X-VERSION:3']
+            
+            # Single-pass: one FFmpeg process decodes the source once and encodes every quality from it
+            if not use_two_pass:
+                for quality in available_qualities:
+                    os.makedirs(os.path.join(temp_dir, quality), exist_ok=True)
+                encoder = await VideoProcessor.get_video_encoder()
+                cmd = VideoProcessor.build_hls_command(video_path, temp_dir, available_qualities, encoder)
+                combined_result = await VideoProcessor.run_command(cmd, timeout=300 * len(available_qualities))
             
             for quality, settings_dict in available_qualities.items():
                 quality_dir = os.path.join(temp_dir, quality)
@@ -107,13 +306,12 @@ class VideoProcessor:
                 video_filter = f"scale={settings_dict['width']}:{settings_dict['height']}:force_original_aspect_ratio=decrease"
                 
                 # FFmpeg command for HLS with improved compression
-                # Check if we should use two-pass encoding
-                use_two_pass = getattr(settings, 'USE_TWO_PASS_ENCODING', False)
                 if use_two_pass:
                     # First pass - analyze video
                     first_pass_log = os.path.join(quality_dir, 'ffmpeg2pass')
                     first_pass_cmd = [
                         '/usr/bin/ffmpeg',
+                        *FFMPEG_QUIET_ARGS,
                     '-y',
                     '-i', video_path,
                     '-vf', video_filter,
@@ -132,12 +330,13 @@ class VideoProcessor:
                 ]
                 
                     # Run first pass
-                    first_pass_result = subprocess.run(first_pass_cmd, capture_output=True, timeout=300)
+                    first_pass_result = await VideoProcessor.run_command(first_pass_cmd, timeout=300)
                     
                     if first_pass_result.returncode == 0:
                         # Second pass - encode with knowledge from first pass
                         cmd = [
                             '/usr/bin/ffmpeg',
+                            *FFMPEG_QUIET_ARGS,
                         '-i', video_path,
                         '-vf', video_filter,
                         '-c:v', 'libx264',
@@ -158,11 +357,12 @@ class VideoProcessor:
                         output_path
                     ]
                     
-                        result = subprocess.run(cmd, capture_output=True, timeout=600)  # Longer timeout for better compression
+                        result = await VideoProcessor.run_command(cmd, timeout=600)  # Longer timeout for better compression
                     else:
                         # If first pass fails, fall back to single-pass encoding
                         cmd = [
                             '/usr/bin/ffmpeg',
+                            *FFMPEG_QUIET_ARGS,
                         '-i', video_path,
                         '-vf', video_filter,
                         '-c:v', 'libx264',
@@ -178,50 +378,27 @@ class VideoProcessor:
                         output_path
                     ]
                     
-                        result = subprocess.run(cmd, capture_output=True, timeout=300)
+                        result = await VideoProcessor.run_command(cmd, timeout=300)
                 else:
-                    # Single-pass encoding if two-pass is disabled
-                    # Get thread count from settings
-                    thread_count = getattr(settings, 'FFMPEG_THREADS', 0)
-                    thread_param = [] if thread_count == 0 else ['-threads', str(thread_count)]
-                    
-                    cmd = [
-                        '/usr/bin/ffmpeg',
-                        '-i', video_path,
-                    ] + thread_param + [
-                        '-vf', video_filter,
-                        '-c:v', 'libx264',
-                        '-b:v', settings_dict['bitrate'],
-                        '-maxrate', f"{int(float(settings_dict['bitrate'].replace('k', '')) * 1.5)}k",
-                        '-bufsize', f"{int(float(settings_dict['bitrate'].replace('k', '')) * 2)}k",
-                        '-crf', str(settings_dict['crf']),
-                        '-preset', getattr(settings, 'VIDEO_COMPRESSION_PRESET', 'medium'),
-                        '-c:a', 'aac',
-                        '-b:a', settings_dict['audio_bitrate'],
-                        '-ac', '2',  # Stereo audio
-                        '-ar', '44100',  # Audio sample rate
-                        '-hls_time', '6',
-                        '-hls_playlist_type', 'vod',
-                        '-hls_segment_filename', os.path.join(quality_dir, 'segment_%03d.ts'),
-                        '-f', 'hls',
-                        output_path
-                    ]
-                    
-                    result = subprocess.run(cmd, capture_output=True, timeout=300)
+                    # Every quality came out of the combined single-pass encode
+                    result = combined_result
                 
                 if result.returncode == 0:
                     # Read playlist
                     with open(output_path, 'r') as f:
                         playlist_content = f.read()
                     
-                    # Read segments
-                    segments = []
-                    for segment_file in sorted(Path(quality_dir).glob('segment_*.ts')):
-                        with open(segment_file, 'rb') as f:
-                            segments.append({
-                                'filename': segment_file.name,
-                                'data': f.read()
-                            })
+                    # List segment files (.ts segments, or the fMP4 init/data files);
+                    # they stay on disk and are streamed to R2 from there
+                    segments = [
+                        {
+                            'filename': segment_file.name,
+                            'path': str(segment_file),
+                            'content_type': HLS_MEDIA_CONTENT_TYPES[segment_file.suffix]
+                        }
+                        for segment_file in sorted(Path(quality_dir).iterdir())
+                        if segment_file.suffix in HLS_MEDIA_CONTENT_TYPES
+                    ]
                     
                     hls_data['playlists'][quality] = {
                         'playlist': playlist_content,
@@ -237,10 +414,12 @@ class VideoProcessor:
             # Create master playlist
             hls_data['master_playlist'] = '\n'.join(master_playlist_lines)
             
-            # Clean up temp directory
-            shutil.rmtree(temp_dir, ignore_errors=True)
+            # Nothing encoded: clean up now, since no caller will get the temp directory
+            if not hls_data['playlists']:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                return None
             
-            return hls_data if hls_data['playlists'] else None
+            return hls_data
             
         except Exception as e:
             print(f"HLS creation error: {e}")
@@ -249,79 +428,74 @@ class VideoProcessor:
             return None
 
     @staticmethod
-    async def get_video_height(video_path: str) -> Optional[int]:
-        """Get video height"""
+    async def probe_video(video_path: str) -> Tuple[Optional[float], Optional[int]]:
+        """Get video duration and height with a single FFprobe call"""
         try:
             cmd = [
                 '/usr/bin/ffprobe',
                 '-v', 'error',
                 '-select_streams', 'v:0',
-                '-show_entries', 'stream=height',
-                '-of', 'default=noprint_wrappers=1:nokey=1',
+                '-show_entries', 'format=duration:stream=height',
+                '-of', 'json',
                 video_path
             ]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            if result.returncode == 0 and result.stdout.strip():
-                return int(result.stdout.strip())
+            result = await VideoProcessor.run_command(cmd, timeout=30)
+            if result.returncode == 0:
+                probe = json.loads(result.stdout)
+                duration = probe.get('format', {}).get('duration')
+                streams = probe.get('streams') or [{}]
+                height = streams[0].get('height')
+                return (
+                    float(duration) if duration else None,
+                    int(height) if height else None
+                )
         except Exception:
             pass
-        return None
+        return None, None
+
+    @staticmethod
+    async def get_video_height(video_path: str) -> Optional[int]:
+        """Get video height"""
+        _, height = await VideoProcessor.probe_video(video_path)
+        return height
 
     @staticmethod
     async def get_video_duration(video_path: str) -> Optional[float]:
         """Extract video duration using FFprobe"""
-        try:
-            cmd = [
-                '/usr/bin/ffprobe',
-                '-v', 'error',
-                '-show_entries', 'format=duration',
-                '-of', 'default=noprint_wrappers=1:nokey=1',
-                video_path
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-            
-            if result.returncode == 0 and result.stdout.strip():
-                return float(result.stdout.strip())
-            return None
-        except Exception:
-            return None
+        duration, _ = await VideoProcessor.probe_video(video_path)
+        return duration
 
     @staticmethod
     async def generate_thumbnail(video_path: str, time_offset: str = "00:00:01") -> Optional[bytes]:
         """Generate video thumbnail at specified time offset"""
         try:
-            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp_thumb:
-                thumbnail_path = tmp_thumb.name
-
             # Get thread count from settings
             thread_count = getattr(settings, 'FFMPEG_THREADS', 0)
             thread_param = [] if thread_count == 0 else ['-threads', str(thread_count)]
             
+            # Write the JPEG to stdout instead of a temp file; -noaccurate_seek takes the keyframe
+            # at the offset rather than decoding every frame up to it
             cmd = [
                 '/usr/bin/ffmpeg',
+                *FFMPEG_QUIET_ARGS,
                 '-ss', time_offset,
+                '-noaccurate_seek',
                 '-i', video_path,
             ] + thread_param + [
+                '-an', '-sn',  # Only the video stream is needed
                 '-vframes', '1',
                 '-q:v', '2',
-                '-y',
-                thumbnail_path
+                '-f', 'image2pipe',
+                '-vcodec', 'mjpeg',
+                'pipe:1'
             ]
             
-            result = subprocess.run(cmd, capture_output=True, timeout=30)
-            
-            if result.returncode == 0 and os.path.exists(thumbnail_path):
-                with open(thumbnail_path, 'rb') as f:
-                    thumbnail_bytes = f.read()
-                os.unlink(thumbnail_path)
-                return thumbnail_bytes
+            result = await VideoProcessor.run_command(cmd, timeout=30)
             
-            if os.path.exists(thumbnail_path):
-                os.unlink(thumbnail_path)
+            if result.returncode == 0 and result.stdout:
+                return result.stdout
             return None
         except Exception:
-            if 'thumbnail_path' in locals() and os.path.exists(thumbnail_path):
-                os.unlink(thumbnail_path)
             return None
 
 
@@ -1,140 +1,212 @@
 import asyncio
 from typing import Optional
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 from bson import ObjectId
-import tempfile
+import fcntl
 import os
-import requests
+import shutil
+import socket
 from app.utils.video_processing import video_processor
 from app.utils.storage import r2_storage
+from app.utils.cache import video_response_cache
 from app.config import settings
 
 
+# Queued once per worker by stop_worker to tell it to exit
+_STOP = object()
+
+# Raw uploads only exist on the local disk of the host that received them
+PROCESSING_HOST = socket.gethostname()
+
+
+def claim_raw_video(raw_video_path: str) -> Optional[int]:
+    """
+    Take an exclusive lock on a raw upload and return its file descriptor, or None if the file
+    is gone or another live process holds it. The owning process keeps the lock from upload
+    until processing ends (the OS drops it if the process dies), which is how startup recovery
+    tells orphaned uploads from ones a sibling worker is still handling.
+    """
+    try:
+        fd = os.open(raw_video_path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
 class VideoProcessingQueue:
     def __init__(self):
         self.queue = asyncio.Queue()
         self.processing = False
-        self.worker_task = None
-        self.semaphore = asyncio.Semaphore(getattr(settings, 'MAX_CONCURRENT_UPLOADS', 1))
+        self.worker_count = getattr(settings, 'MAX_CONCURRENT_UPLOADS', 1)
+        self.workers = []
+        self.stale_sweeper = None
+        self.orphan_timeout = timedelta(minutes=getattr(settings, 'ORPHANED_VIDEO_TIMEOUT_MINUTES', 120))
         
     def start_worker(self):
-        """Start the background worker task"""
+        """Start the background worker tasks"""
         if not self.processing:
             self.processing = True
-            # Schedule the worker as a background task
-            asyncio.create_task(self._worker())
-            print("Video processing worker started")
+            # A fixed pool of long-lived workers; the pool size is the processing concurrency limit
+            self.workers = [asyncio.create_task(self._worker()) for _ in range(self.worker_count)]
+            self.stale_sweeper = asyncio.create_task(self._sweep_stale_videos())
+            print(f"Video processing workers started ({self.worker_count})")
     
-    async def add_to_queue(self, video_id: str, raw_video_url: str):
-        """Add a video to the processing queue"""
+    async def add_to_queue(self, video_oid: ObjectId, raw_video_path: str, raw_video_lock: Optional[int]):
+        """
+        Add a video to the processing queue (keyed by the inserted ObjectId, so it is never re-parsed).
+        The queue takes over raw_video_lock (from claim_raw_video, if any) and releases it when processing ends.
+        """
         await self.queue.put({
-            'video_id': video_id,
-            'raw_video_url': raw_video_url,
-            'added_at': datetime.now(timezone.utc)
+            'video_id': str(video_oid),
+            'video_oid': video_oid,
+            'raw_video_path': raw_video_path,
+            'raw_video_lock': raw_video_lock
         })
-        print(f"Video {video_id} added to processing queue. Queue size: {self.queue.qsize()}")
     
-    async def _worker(self):
-        """Background worker that processes videos with concurrency control"""
-        print("Worker task started, waiting for videos...")
+    async def requeue_interrupted(self):
+        """
+        Recover videos left pending/processing by a restart or deploy, since the queue only lives in
+        memory. Uploads whose raw file is still on this host and not locked by a live worker are
+        queued again; ones whose raw file is gone are marked failed so they don't stay pending,
+        as are other hosts' videos past the orphan timeout (see fail_stale_videos).
+        """
+        from app.database import get_database
+        db = get_database()
         
-        # Create a list to hold all running tasks
-        tasks = []
+        unfinished = {"processing_status": {"$in": ["pending", "processing"]}, "is_active": True}
+        cursor = db.videos.find(
+            {**unfinished, "$or": [{"processing_host": PROCESSING_HOST}, {"raw_video_path": {"$exists": False}}]},
+            {"raw_video_path": 1}
+        )
+        requeued = failed = 0
+        async for video in cursor:
+            raw_video_path = video.get("raw_video_path")
+            raw_video_lock = claim_raw_video(raw_video_path) if raw_video_path else None
+            if raw_video_lock is not None:
+                await self.add_to_queue(video["_id"], raw_video_path, raw_video_lock)
+                requeued += 1
+            elif not raw_video_path or not os.path.exists(raw_video_path):
+                # Workers finish the status update before removing the raw file, so a missing
+                # file with an unfinished status means the upload was lost
+                result = await db.videos.update_one(
+                    {"_id": video["_id"], **unfinished},
+                    {"$set": {
+                        "processing_status": "failed",
+                        "processing_error": "Upload was interrupted by a server restart, please upload again",
+                        "updated_at": datetime.now(timezone.utc)
+                    }}
+                )
+                failed += result.modified_count
+            # Otherwise a sibling worker holds the lock and is still processing it
+        
+        failed += await self.fail_stale_videos()
+        if requeued or failed:
+            print(f"Recovered interrupted videos: {requeued} requeued, {failed} marked failed")
+    
+    async def fail_stale_videos(self) -> int:
+        """
+        Mark failed the unfinished videos of other hosts that haven't been touched within the orphan
+        timeout. Their raw file only existed on that host, which may have been replaced by a deploy
+        (container hostnames change), so nothing else can ever finish them. A live host that was
+        just slow still overwrites this with its own final status.
+        """
+        from app.database import get_database
+        db = get_database()
         
+        result = await db.videos.update_many(
+            {
+                "processing_status": {"$in": ["pending", "processing"]},
+                "is_active": True,
+                "processing_host": {"$ne": PROCESSING_HOST},
+                "updated_at": {"$lt": datetime.now(timezone.utc) - self.orphan_timeout}
+            },
+            {"$set": {
+                "processing_status": "failed",
+                "processing_error": "Upload was interrupted by a server restart, please upload again",
+                "updated_at": datetime.now(timezone.utc)
+            }}
+        )
+        return result.modified_count
+    
+    async def _sweep_stale_videos(self):
+        """Background task that runs fail_stale_videos periodically, for hosts that went away after our startup"""
         while self.processing:
+            await asyncio.sleep(self.orphan_timeout.total_seconds() / 4)
             try:
-                # Wait for next video with timeout
-                task = await asyncio.wait_for(self.queue.get(), timeout=1.0)
-                
-                video_id = task['video_id']
-                raw_video_url = task['raw_video_url']
-                
-                print(f"Queueing video {video_id}... Queue remaining: {self.queue.qsize()}")
-                
-                # Create a task for processing this video
-                process_task = asyncio.create_task(self._process_video_with_semaphore(video_id, raw_video_url))
-                
-                # Add cleanup callback
-                process_task.add_done_callback(lambda t: tasks.remove(t) if t in tasks else None)
-                tasks.append(process_task)
-                
-                # Mark the queue item as done
-                self.queue.task_done()
-                
-            except asyncio.TimeoutError:
-                # Queue timeout - this is normal, just continue
-                continue
+                failed = await self.fail_stale_videos()
+                if failed:
+                    print(f"Marked {failed} orphaned videos failed")
             except Exception as e:
-                print(f"Worker error: {e}")
-                continue
-                
-            # Clean up completed tasks
-            tasks = [t for t in tasks if not t.done()]
+                print(f"Stale video sweep error: {e!r}")
     
-    async def _process_video_with_semaphore(self, video_id: str, raw_video_url: str):
-        """Process a video with semaphore for concurrency control"""
-        async with self.semaphore:
-            print(f"Processing video {video_id}...")
+    async def _worker(self):
+        """Background worker that takes videos off the queue and processes them one at a time"""
+        while True:
+            # Sleeps until there is work; stop_worker wakes it with a sentinel
+            task = await self.queue.get()
+            if task is _STOP:
+                self.queue.task_done()
+                break
+            
+            video_id = task['video_id']
             try:
-                await self._process_video(video_id, raw_video_url)
-                print(f"Video {video_id} processed successfully")
+                await self._process_video(video_id, task['video_oid'], task['raw_video_path'])
             except Exception as process_error:
                 print(f"Error processing video {video_id}: {process_error}")
+            finally:
+                # The raw file has been removed (or the job failed); let go of its lock
+                if task['raw_video_lock'] is not None:
+                    os.close(task['raw_video_lock'])
+                self.queue.task_done()
     
-    async def _process_video(self, video_id: str, raw_video_url: str):
+    async def _process_video(self, video_id: str, video_oid: ObjectId, raw_video_path: str):
         """Process a single video"""
         from app.database import get_database
         db = get_database()
+        hls_data = None
         
         try:
-            # Update status to processing
-            await db.videos.update_one(
-                {"_id": ObjectId(video_id)},
-                {"$set": {"processing_status": "processing", "updated_at": datetime.now(timezone.utc)}}
-            )
-            
-            # Download raw video to temp file
-            temp_path = None
-            
-            def download_file():
-                try:
-                    response = requests.get(raw_video_url, stream=True, timeout=300)
-                    response.raise_for_status()
-                    
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.mp4') as tmp_file:
-                        for chunk in response.iter_content(chunk_size=65536):  # Larger chunks for faster download
-                            tmp_file.write(chunk)
-                        return tmp_file.name
-                except Exception as e:
-                    print(f"Download error for video {video_id}: {str(e)}")
-                    raise
+            # The upload handler already saved the raw video to a local temp file
+            temp_path = raw_video_path
             
-            # Run download in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            temp_path = await loop.run_in_executor(None, download_file)
+            # Update status to processing while the encode starts, rather than waiting a round trip first
+            processing_update = asyncio.ensure_future(db.videos.update_one(
+                {"_id": video_oid},
+                {"$set": {"processing_status": "processing", "updated_at": datetime.now(timezone.utc)}}
+            ))
             
             # Process video to HLS
-            duration, thumbnail_bytes, hls_data = await video_processor.process_video_to_hls(temp_path)
+            try:
+                duration, thumbnail_bytes, hls_data = await video_processor.process_video_to_hls(temp_path)
+            finally:
+                # Settle the processing write before any final status so it can't land after it
+                await asyncio.gather(processing_update, return_exceptions=True)
             
             if not hls_data:
                 raise Exception("Failed to process video to HLS")
             
-            # Upload HLS content to R2
-            playlist_url = await r2_storage.upload_hls_content(hls_data, video_id)
-            
-            # Upload thumbnail if generated
-            thumbnail_url = None
+            # Upload HLS content and thumbnail (if generated) to R2 concurrently
+            uploads = [r2_storage.upload_hls_content(hls_data, video_id)]
             if thumbnail_bytes:
                 thumbnail_filename = f"thumb_{video_id}.jpg"
-                thumbnail_url = await r2_storage.upload_file(
+                uploads.append(r2_storage.upload_file(
                     thumbnail_bytes,
                     thumbnail_filename,
                     "image/jpeg"
-                )
+                ))
+            
+            upload_results = await asyncio.gather(*uploads)
+            playlist_url = upload_results[0]
+            thumbnail_url = upload_results[1] if thumbnail_bytes else None
             
             # Update video with processed content
             await db.videos.update_one(
-                {"_id": ObjectId(video_id)},
+                {"_id": video_oid},
                 {"$set": {
                     "playlist_url": playlist_url,
                     "thumbnail_url": thumbnail_url,
@@ -143,6 +215,7 @@ class VideoProcessingQueue:
                     "updated_at": datetime.now(timezone.utc)
                 }}
             )
+            video_response_cache.invalidate(video_id)
             
             # Clean up temp file
             if temp_path and os.path.exists(temp_path):
@@ -155,7 +228,7 @@ class VideoProcessingQueue:
             
             # Update status to failed
             await db.videos.update_one(
-                {"_id": ObjectId(video_id)},
+                {"_id": video_oid},
                 {"$set": {
                     "processing_status": "failed",
                     "processing_error": str(e),
@@ -166,11 +239,24 @@ class VideoProcessingQueue:
             # Clean up temp file on error
             if 'temp_path' in locals() and temp_path and os.path.exists(temp_path):
                 os.unlink(temp_path)
+        
+        finally:
+            # The encoded segments stay on disk until they have been uploaded
+            if hls_data:
+                shutil.rmtree(hls_data['temp_dir'], ignore_errors=True)
     
     async def stop_worker(self):
-        """Stop the background worker"""
-        self.processing = False
-        print("Video processing worker stopped")
+        """Stop the background workers"""
+        if self.processing:
+            self.processing = False
+            for _ in self.workers:
+                self.queue.put_nowait(_STOP)
+            self.workers = []
+            # The sweep is a single idempotent update, so it is safe to cancel mid-way
+            if self.stale_sweeper:
+                self.stale_sweeper.cancel()
+                self.stale_sweeper = None
+        print("Video processing workers stopped")
     
     def get_queue_size(self) -> int:
         """Get current queue size"""
@@ -0,0 +1,118 @@
+import asyncio
+from collections import defaultdict
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, ServerSelectionTimeoutError
+from app.config import settings
+from app.utils.cache import TTLCache, video_cache
+
+
+class ViewCounter:
+    """
+    Write-behind view counter: views are counted in memory and flushed to MongoDB
+    as one bulk $inc per video every few seconds, instead of one write per view
+    """
+
+    def __init__(self):
+        self.pending = defaultdict(int)
+        self.in_flight = {}  # Counts taken by the flush currently being written
+        self.reported = TTLCache(maxsize=10000, ttl=60)  # video_id -> views last reported by current_views
+        self.processing = False
+        self.worker_task = None
+        self._stop_event = asyncio.Event()
+        self.flush_interval = getattr(settings, 'VIEW_COUNT_FLUSH_SECONDS', 5)
+
+    def start_worker(self):
+        """Start the background flush task"""
+        if not self.processing:
+            self.processing = True
+            # Schedule the worker as a background task, keeping the handle so stop_worker can await it
+            self._stop_event.clear()
+            self.worker_task = asyncio.create_task(self._worker())
+            print("View counter flush worker started")
+
+    def increment(self, video_id: str):
+        """Record a view"""
+        self.pending[video_id] += 1
+
+    def current_views(self, video_id: str, stored_views: int) -> int:
+        """
+        Views to report for a video: the stored count plus this process's views not yet written
+        (pending or mid-flush), and never lower than the last count this process reported for it,
+        so a cached stored count that predates a flush can't make the number go backwards
+        """
+        views = stored_views + self.pending.get(video_id, 0) + self.in_flight.get(video_id, 0)
+        last_reported = self.reported.get(video_id)
+        if last_reported is not None and last_reported > views:
+            views = last_reported
+        self.reported.set(video_id, views)
+        return views
+
+    async def _worker(self):
+        """Background worker that periodically flushes pending view counts"""
+        while self.processing:
+            # Sleep for the flush interval, waking early when stop_worker is called
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            await self.flush()
+
+    async def flush(self):
+        """Write all pending view counts to MongoDB in a single bulk write"""
+        if not self.pending:
+            return
+
+        # Swap in a fresh dict so views recorded during the write land in the next batch;
+        # the taken counts stay visible to current_views until they are written
+        pending, self.pending = self.pending, defaultdict(int)
+        self.in_flight = pending
+
+        from app.database import get_database
+        db = get_database()
+
+        batch = list(pending.items())
+        try:
+            await db.videos.bulk_write(
+                [UpdateOne({"_id": ObjectId(video_id)}, {"$inc": {"views": count}}) for video_id, count in batch],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            # Unordered, so every update without a write error was applied; re-queue only the
+            # failed ones (by their index in the batch) so nothing is dropped or double counted
+            write_errors = e.details.get('writeErrors', [])
+            for write_error in write_errors:
+                video_id, count = batch[write_error['index']]
+                self.pending[video_id] += count
+            print(f"View count flush failed for {len(write_errors)} of {len(batch)} videos, re-queued: "
+                  f"{[(batch[write_error['index']][0], write_error.get('errmsg')) for write_error in write_errors]}")
+        except ServerSelectionTimeoutError as e:
+            # No server was reachable, so the write was never sent; keep the counts for the next flush
+            for video_id, count in batch:
+                self.pending[video_id] += count
+            print(f"View count flush error, re-queued {sum(pending.values())} views for videos {list(pending)}: {e!r}")
+        except Exception as e:
+            # The write may have been applied before the error (e.g. a timeout waiting for the reply),
+            # and $inc isn't idempotent, so drop the batch rather than risk counting it twice
+            print(f"View count flush error, dropped {sum(pending.values())} views for videos {list(pending)}: {e!r}")
+        finally:
+            self.in_flight = {}
+            # Cached stored counts predate this flush; reload them on next use
+            for video_id in pending:
+                video_cache.invalidate(video_id)
+
+    async def stop_worker(self):
+        """Stop the background worker and flush whatever is still pending"""
+        self.processing = False
+        self._stop_event.set()
+        # Let a flush already in progress finish (flushes must not overlap: each owns in_flight),
+        # then write whatever arrived meanwhile before the database connection is closed
+        if self.worker_task:
+            await self.worker_task
+            self.worker_task = None
+        await self.flush()
+        print("View counter flush worker stopped")
+
+
+# Global view counter instance
+view_counter = ViewCounter()
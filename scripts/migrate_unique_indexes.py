@@ -0,0 +1,101 @@
+"""
+One-off migration for databases that predate the unique indexes on interactions and
+user_view_history.
+Run it once, with the app stopped, before deploying the version that creates them:
+
+    python -m scripts.migrate_unique_indexes
+
+For each collection it drops an older non-unique index on the same keys, removes
+duplicate rows, and builds the unique index. Videos whose like/dislike/save counters were
+inflated by duplicate interactions get them recomputed. Running it again is harmless.
+"""
+import asyncio
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.config import settings
+
+
+async def drop_non_unique_index(collection, keys):
+    """Drop an existing non-unique index on exactly these keys, which would block the unique one"""
+    for name, info in (await collection.index_information()).items():
+        if [(field, int(direction)) for field, direction in info["key"]] == keys and not info.get("unique"):
+            await collection.drop_index(name)
+            print(f"{collection.name}: dropped non-unique index {name}")
+
+
+async def duplicate_groups(collection, keys, sort):
+    """Yield (group key, IDs of the extra documents) for each duplicate group, keeping the first in sort order"""
+    cursor = collection.aggregate([
+        {"$sort": sort},
+        {"$group": {"_id": {field: f"${field}" for field, _ in keys}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+    async for group in cursor:
+        yield group["_id"], group["ids"][1:]
+
+
+# Interaction type -> counter field on the video document
+INTERACTION_COUNTERS = {
+    "like": "likes",
+    "dislike": "dislikes",
+    "save": "saved_count"
+}
+
+
+async def migrate_interactions(db):
+    """Deduplicate interactions per user, video and type, make that index unique, and fix the affected counters"""
+    keys = [("user_id", 1), ("video_id", 1), ("interaction_type", 1)]
+    await drop_non_unique_index(db.interactions, keys)
+
+    # Keep the original interaction, so the saved feed keeps its position
+    removed = 0
+    affected_video_ids = set()
+    async for group_key, extra_ids in duplicate_groups(db.interactions, keys, {"created_at": 1}):
+        result = await db.interactions.delete_many({"_id": {"$in": extra_ids}})
+        removed += result.deleted_count
+        affected_video_ids.add(group_key["video_id"])
+
+    await db.interactions.create_index(keys, unique=True)
+    print(f"interactions: removed {removed} duplicate rows, unique index built")
+
+    # Each duplicate was also counted on the video, so recount those videos from the remaining rows
+    for video_id in affected_video_ids:
+        if not ObjectId.is_valid(video_id):
+            continue
+        counts = {counter: 0 for counter in INTERACTION_COUNTERS.values()}
+        async for row in db.interactions.aggregate([
+            {"$match": {"video_id": video_id, "interaction_type": {"$in": list(INTERACTION_COUNTERS)}}},
+            {"$group": {"_id": "$interaction_type", "count": {"$sum": 1}}}
+        ]):
+            counts[INTERACTION_COUNTERS[row["_id"]]] = row["count"]
+        await db.videos.update_one({"_id": ObjectId(video_id)}, {"$set": counts})
+    print(f"interactions: recomputed counters for {len(affected_video_ids)} videos")
+
+
+async def migrate_view_history(db):
+    """Deduplicate user_view_history on (user_id, video_id) and make that index unique"""
+    keys = [("user_id", 1), ("video_id", 1)]
+    await drop_non_unique_index(db.user_view_history, keys)
+
+    # Keep the most recent view, so the surviving row has the latest expiry
+    removed = 0
+    async for _, extra_ids in duplicate_groups(db.user_view_history, keys, {"expires_at": -1}):
+        result = await db.user_view_history.delete_many({"_id": {"$in": extra_ids}})
+        removed += result.deleted_count
+
+    await db.user_view_history.create_index(keys, unique=True)
+    print(f"user_view_history: removed {removed} duplicate rows, unique index built")
+
+
+async def main():
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+    db = client[settings.MONGODB_DB_NAME]
+    try:
+        await migrate_interactions(db)
+        await migrate_view_history(db)
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())